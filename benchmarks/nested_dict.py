@@ -0,0 +1,132 @@
+"""Times NestedDict lookups, bulk-loading and saving and opening, and
+measures the memory of the frozen version
+
+Run it from the repository root::
+
+  PYTHONPATH=. python benchmarks/nested_dict.py
+"""
+# python
+from itertools import product
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import default_timer
+from timeit import repeat
+import random
+import tracemalloc
+
+# this project
+from graeae.collections.nested_dict import NestedDict
+
+LETTERS = "abcdefghij"
+DEPTH = 5
+LOOKUPS = 100000
+# how many different paths get looked up
+HOT_PATHS = 2000
+REPEATS = 5
+
+
+def build(indexed: bool) -> NestedDict:
+    """Builds a tree with len(LETTERS)**DEPTH leaves
+
+    Args:
+     indexed: whether to keep the flat index
+    """
+    nested = NestedDict(indexed=indexed)
+    for count, keys in enumerate(product(LETTERS, repeat=DEPTH)):
+        nested["/".join(keys)] = count
+    return nested
+
+
+def time_loads(flat: dict) -> tuple:
+    """Best times (seconds) to load the flat mapping one path at a time and
+    with update_many
+
+    Args:
+     flat: path -> value mapping to load
+    """
+    def one_at_a_time():
+        nested = NestedDict()
+        for path, value in flat.items():
+            nested[path] = value
+
+    def update_many():
+        NestedDict().update_many(flat)
+    return (min(repeat(one_at_a_time, number=1, repeat=REPEATS)),
+            min(repeat(update_many, number=1, repeat=REPEATS)))
+
+
+def allocated(build) -> int:
+    """Bytes allocated (and still held) by calling build
+
+    Args:
+     build: callable that builds something
+    """
+    tracemalloc.start()
+    thing = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del thing
+    return size
+
+
+def time_lookups(nested: NestedDict, paths: list) -> float:
+    """Best time (seconds) to look up all the paths
+
+    Args:
+     nested: the tree to look things up in
+     paths: the paths to look up
+    """
+    def lookups():
+        for path in paths:
+            nested[path]
+    return min(repeat(lookups, number=1, repeat=REPEATS))
+
+
+if __name__ == "__main__":
+    random.seed(2019)
+    hot = ["/".join(random.choice(LETTERS) for _ in range(DEPTH))
+           for _ in range(HOT_PATHS)]
+    paths = [random.choice(hot) for _ in range(LOOKUPS)]
+    print(f"{len(LETTERS)**DEPTH:,} leaves, {LOOKUPS:,} lookups"
+          f" of {HOT_PATHS:,} paths, best of {REPEATS}")
+    key_tuples = [tuple(path.split("/")) for path in paths]
+    walker, indexed = build(False), build(True)
+    frozen = walker.freeze()
+    for label, nested, keys in (("tree-walk", walker, paths),
+                                ("tuple keys", walker, key_tuples),
+                                ("indexed", indexed, paths),
+                                ("frozen", frozen, paths)):
+        seconds = time_lookups(nested, keys)
+        print(f"{label:>10}: {seconds:.3f} seconds"
+              f" ({1e9 * seconds/LOOKUPS:,.0f} ns/lookup)")
+
+    flat = dict(walker.iter_leaves())
+    one_at_a_time, update_many = time_loads(flat)
+    print(f"Loading {len(flat):,} paths, best of {REPEATS}")
+    print(f"  one at a time: {one_at_a_time:.3f} seconds")
+    print(f"    update_many: {update_many:.3f} seconds")
+
+    # both copies share the leaf values so only the structure gets counted
+    print("Memory for the tree")
+    print(f"     NestedDict: {allocated(frozen.thaw):,} bytes")
+    print(f"         frozen: {allocated(walker.freeze):,} bytes")
+
+    with TemporaryDirectory() as directory:
+        path = Path(directory)/"nested.bin"
+        started = default_timer()
+        walker.save(path)
+        saved = default_timer() - started
+        started = default_timer()
+        mapped = NestedDict.open(path)
+        opened = default_timer() - started
+        seconds = time_lookups(mapped, paths)
+        mapped.close()
+        started = default_timer()
+        NestedDict.open(path, mmap=False)
+        loaded = default_timer() - started
+        print(f"Saving and opening ({path.stat().st_size:,} bytes)")
+        print(f"           save: {saved:.3f} seconds")
+        print(f"    open (mmap): {opened:.6f} seconds")
+        print(f"      open+load: {loaded:.3f} seconds")
+        print(f"  mmap lookups: {seconds:.3f} seconds"
+              f" ({1e9 * seconds/LOOKUPS:,.0f} ns/lookup)")
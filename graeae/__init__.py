@@ -2,5 +2,8 @@ from .infrastructure.base import SysLogBase
 from .infrastructure.downloader import TextDownloader, ZipDownloader
 from .infrastructure.environment import EnvironmentLoader, SubPathLoader
 from .timers.timer import Timer
+from .timers.registry import TimerRegistry
+from .timers.spans import Trace
+from .timers.profiler import SamplingProfiler
 from .tables.tables import CountPercentage
 from .visualization.embed import EmbedHoloviews
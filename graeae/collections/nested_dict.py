@@ -1,23 +1,157 @@
+# python
+from bisect import bisect_left
+from collections.abc import Mapping
+from functools import lru_cache
+from mmap import mmap as MemoryMap, ACCESS_READ
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Tuple, Union
+import os
+import pickle
+import struct
+
+PATH_CACHE_SIZE = 2**14
+
+# The binary layout used by NestedDict.save and NestedDict.open
+# (all little-endian):
+#  header: magic, version, separator-length, root-node offset, separator
+#  node: entry-count then the entries sorted by their (utf-8) keys
+#  entry: key offset, key length, value-type, 8 bytes of value
+# Ints and floats fit in the entry, everything else is an offset to a
+# length-prefixed blob (or a node for the dictionaries).
+MAGIC = b"GRND"
+VERSION = 1
+HEADER = struct.Struct("<4sBIQ")
+COUNT = struct.Struct("<I")
+ENTRY = struct.Struct("<QIB8s")
+LENGTH = struct.Struct("<Q")
+INTEGER = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+NOTHING = bytes(8)
+
+
+class ValueType:
+    """The value-type tags in the binary entries"""
+    node = 0
+    none = 1
+    false = 2
+    true = 3
+    integer = 4
+    float = 5
+    string = 6
+    bytes = 7
+    pickle = 8
+
+
+@lru_cache(maxsize=None)
+def path_splitter(separator: str) -> Callable:
+    """Builds a function to split path-strings into tuples of keys
+
+    The function keeps the most recently used splits (up to
+    PATH_CACHE_SIZE), since the same paths tend to get used over and over,
+    and there's one per separator so all the NestedDicts share them.
+
+    Args:
+     separator: token to split the paths on
+    """
+    @lru_cache(maxsize=PATH_CACHE_SIZE)
+    def split_path(path: str) -> tuple:
+        """Splits the path on the separator"""
+        return tuple(path.split(separator))
+    return split_path
+
+
 class NestedDict:
     """builds nested dictionaries
 
+    The paths can also be tuples of keys, which skips splitting the string.
+
     Args:
      separator: token to split the keys in the path-string
      dictionary: a starting dictionary
+     indexed: keep a flat path -> value index for single-probe lookups
     """
-    def __init__(self, separator: str="/", dictionary: dict=None) -> None:
+    def __init__(self, separator: str="/", dictionary: dict=None,
+                 indexed: bool=False) -> None:
         self.separator = separator
+        self.indexed = indexed
+        self._index = None
         self.dictionary = dictionary if dictionary else {}
         return
-    
-    def __getitem__(self, path: str):
+
+    @property
+    def separator(self) -> str:
+        """The token to split the keys in the path-string"""
+        return self._separator
+
+    @separator.setter
+    def separator(self, separator: str) -> None:
+        """Sets the separator and the path-splitter to go with it"""
+        self._separator = separator
+        self.split_path = path_splitter(separator)
+        return
+
+    @property
+    def dictionary(self) -> dict:
+        """The nested dictionaries"""
+        return self._dictionary
+
+    @dictionary.setter
+    def dictionary(self, dictionary: dict) -> None:
+        """Sets the dictionary and rebuilds the index (if indexed)
+
+        Args:
+         dictionary: the new nested dictionaries
+        """
+        self._dictionary = dictionary
+        if self.indexed:
+            self._index = {}
+            self._add_to_index("", dictionary)
+        return
+
+    def _add_to_index(self, path: str, value: object) -> None:
+        """Adds the value and everything under it to the index
+
+        Args:
+         path: the path to the value ("" for the root)
+         value: the thing at the end of the path
+        """
+        if path:
+            self._index[path] = value
+        if type(value) is dict:
+            prefix = path + self.separator if path else ""
+            for key, child in value.items():
+                self._add_to_index(prefix + key, child)
+        return
+
+    def _remove_from_index(self, path: str, value: object) -> None:
+        """Removes the value and everything under it from the index
+
+        Args:
+         path: the path to the value
+         value: the thing that used to be at the end of the path
+        """
+        self._index.pop(path, None)
+        if type(value) is dict:
+            for key, child in value.items():
+                self._remove_from_index(path + self.separator + key, child)
+        return
+
+    def __getitem__(self, path: Union[str, tuple]):
         """Gets the item at the end of the path string
 
         Args:
-         path: the keys separated by the separator
+         path: the keys separated by the separator (or a tuple of keys)
         """
-        parent = self.dictionary
-        keys = path.split(self.separator)
+        if self.indexed:
+            try:
+                if type(path) is tuple:
+                    return self._index[self.separator.join(path)]
+                return self._index[path]
+            except KeyError:
+                # fall through so odd paths behave the same as a tree-walk
+                pass
+        parent = self._dictionary
+        keys = path if type(path) is tuple else self.split_path(path)
         for index, key in enumerate(keys):
             if type(parent) is dict:
                 parent = parent[key]
@@ -26,21 +160,605 @@ class NestedDict:
         if index == len(keys) - 1:
             return parent
         return parent[key]
-    
-    def __setitem__(self, path: str, value: object) -> None:
-        """Sets the value to the end of the path
+
+    def _child(self, parent: dict, keys: tuple, depth: int) -> dict:
+        """Gets (or adds) the dictionary for keys[depth] in the parent
 
         Args:
-         path: keys separated by the separator
+         parent: the dictionary for keys[:depth]
+         keys: the keys in the path
+         depth: which key to get
+        """
+        key = keys[depth]
+        if key in parent:
+            return parent[key]
+        child = parent[key] = {}
+        if self.indexed:
+            self._index[self.separator.join(keys[:depth + 1])] = child
+        return child
+
+    def _set_leaf(self, parent: dict, keys: tuple, value: object) -> None:
+        """Sets the value for the last key in the parent
+
+        Args:
+         parent: the dictionary for keys[:-1]
+         keys: the keys in the path
          value: thing to set
         """
-        keys = path.split(self.separator)
-        parent = self.dictionary
-        for key in keys[:-1]:
+        key = keys[-1]
+        if self.indexed:
+            path = self.separator.join(keys)
             if key in parent:
-                parent = parent[key]
+                self._remove_from_index(path, parent[key])
+            parent[key] = value
+            self._add_to_index(path, value)
+        else:
+            parent[key] = value
+        return
+
+    def __setitem__(self, path: Union[str, tuple], value: object) -> None:
+        """Sets the value to the end of the path
+
+        Args:
+         path: keys separated by the separator (or a tuple of keys)
+         value: thing to set
+        """
+        keys = path if type(path) is tuple else self.split_path(path)
+        parent = self._dictionary
+        for depth in range(len(keys) - 1):
+            parent = self._child(parent, keys, depth)
+        self._set_leaf(parent, keys, value)
+        return
+
+    def update_many(self, mapping: dict) -> None:
+        """Sets all the paths in the mapping
+
+        The paths are grouped by their parent path so each parent dictionary
+        is only walked to once, no matter how many values go into it.
+
+        Args:
+         mapping: path (string or tuple of keys) -> value to set
+        """
+        separator = self.separator
+        # parent keys -> the dictionary at the end of them
+        parents = {}
+        for path, value in mapping.items():
+            keys = path if type(path) is tuple else tuple(path.split(separator))
+            parent_keys = keys[:-1]
+            parent = parents.get(parent_keys)
+            if parent is None:
+                parent = self._dictionary
+                for depth in range(len(parent_keys)):
+                    parent = self._child(parent, keys, depth)
+                parents[parent_keys] = parent
+            key = keys[-1]
+            if key in parent and type(parent[key]) is dict:
+                # the parents under the old dictionary are gone
+                parents.clear()
+            if self.indexed:
+                self._set_leaf(parent, keys, value)
             else:
-                parent[key] = {}
-                parent = parent[key]
-        parent[keys[-1]] = value
+                parent[key] = value
+        return
+
+    def deep_merge(self, other: Union["NestedDict", dict]) -> None:
+        """Merges the other tree into this one
+
+        Dictionaries in both get merged, everything else in the other
+        replaces what's here. The other's dictionaries are copied, not shared.
+
+        Args:
+         other: NestedDict or (nested) dict to merge in
+        """
+        if isinstance(other, NestedDict):
+            other = other.dictionary
+        self._merge(self._dictionary, other, ())
+        return
+
+    def _merge(self, target: dict, source: dict, keys: tuple) -> None:
+        """Merges the source dictionary into the target
+
+        Args:
+         target: dictionary to merge into
+         source: dictionary to merge from
+         keys: path to the target
+        """
+        for key, value in source.items():
+            path = keys + (key,)
+            if type(value) is dict:
+                child = target.get(key)
+                if type(child) is not dict:
+                    child = {}
+                    self._set_leaf(target, path, child)
+                self._merge(child, value, path)
+            else:
+                self._set_leaf(target, path, value)
+        return
+
+    def iter_leaves(self) -> Iterator[Tuple[str, object]]:
+        """Generates the (path, value) pairs for the leaves
+
+        The tree is walked lazily so nothing gets built up in memory. Empty
+        dictionaries count as leaves.
+        """
+        separator = self.separator
+        stack = [("", iter(self._dictionary.items()))]
+        while stack:
+            prefix, items = stack[-1]
+            for key, value in items:
+                if type(value) is dict and value:
+                    stack.append((prefix + key + separator,
+                                  iter(value.items())))
+                    break
+                yield prefix + key, value
+            else:
+                stack.pop()
+        return
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Saves the tree in the binary format that NestedDict.open reads
+
+        The keys need to be strings. Leaves that aren't None, bools, ints,
+        floats, strings or bytes get pickled.
+
+        Args:
+         path: the file to save the tree to
+        """
+        path = Path(path)
+        temporary = path.with_name(path.name + ".part")
+        with temporary.open("wb") as writer:
+            writer.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            separator = self.separator.encode("utf-8")
+            writer.write(separator)
+            root = TreeWriter(writer).node(self._dictionary)
+            writer.seek(0)
+            writer.write(HEADER.pack(MAGIC, VERSION, len(separator), root))
+        os.replace(temporary, path)
+        return
+
+    @classmethod
+    def open(cls, path: Union[str, Path],
+             mmap: bool=True) -> Union["NestedDict", "MappedNestedDict"]:
+        """Opens a tree saved with NestedDict.save
+
+        Args:
+         path: the file the tree was saved to
+         mmap: if true, look things up in the memory-mapped file instead of
+           loading the whole tree
+
+        Returns:
+         a read-only MappedNestedDict if mmap, otherwise a NestedDict
+        """
+        mapped = MappedNestedDict(path)
+        if mmap:
+            return mapped
+        with mapped:
+            return cls(separator=mapped.separator,
+                       dictionary=mapped.root.to_dict())
+
+    def freeze(self) -> "FrozenNestedDict":
+        """A read-only, hashable copy of the tree"""
+        return FrozenNestedDict(self)
+
+
+class FrozenNode:
+    """One read-only level of a FrozenNestedDict
+
+    The keys are kept sorted in a tuple (and found with a binary search) with
+    the values in a parallel tuple. Levels with the same keys share the same
+    keys-tuple, so a tree whose levels have the same shape takes a lot less
+    memory than it would as dicts.
+
+    Args:
+     keys: the sorted keys
+     values: the values that go with the keys
+    """
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys: tuple, values: tuple) -> None:
+        self.keys = keys
+        self.values = values
+        return
+
+    @classmethod
+    def from_dict(cls, dictionary: dict, shared: dict=None) -> "FrozenNode":
+        """Builds the nodes for the (nested) dictionary
+
+        Args:
+         dictionary: the dictionary to freeze
+         shared: keys-tuple -> the one copy of it to use
+        """
+        if shared is None:
+            shared = {}
+        keys = tuple(sorted(dictionary))
+        keys = shared.setdefault(keys, keys)
+        return cls(keys, tuple(
+            cls.from_dict(dictionary[key], shared)
+            if type(dictionary[key]) is dict
+            else dictionary[key] for key in keys))
+
+    def get(self, key: str, default: object=None) -> object:
+        """Gets the value for the key or the default if it isn't here"""
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.values[index]
+        return default
+
+    def __getitem__(self, key: str) -> object:
+        """Gets the value for the key"""
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.values[index]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        index = bisect_left(self.keys, key)
+        return index < len(self.keys) and self.keys[index] == key
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        """The (key, value) pairs"""
+        return zip(self.keys, self.values)
+
+    def to_dict(self) -> dict:
+        """Thaws the node (and the ones below it) back into dicts"""
+        return {key: value.to_dict() if type(value) is FrozenNode else value
+                for key, value in zip(self.keys, self.values)}
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not FrozenNode:
+            return NotImplemented
+        return self.keys == other.keys and self.values == other.values
+
+    def __hash__(self) -> int:
+        return hash((self.keys, self.values))
+
+    def __repr__(self) -> str:
+        return f"FrozenNode({self.to_dict()})"
+
+
+class FrozenNestedDict:
+    """A read-only, hashable NestedDict
+
+    Since nothing changes after it's built it can be shared between threads
+    without locks. Each level is a FrozenNode instead of a dict, which cuts
+    down on memory when many processes hold the same big tree.
+
+    Args:
+     nested: the NestedDict (or nested dict) to freeze
+     separator: token to split the paths (if nested is a dict)
+    """
+    __slots__ = ("separator", "root", "split_path", "_hash")
+
+    def __init__(self, nested: Union[NestedDict, dict],
+                 separator: str="/") -> None:
+        if isinstance(nested, NestedDict):
+            separator, nested = nested.separator, nested.dictionary
+        set_attribute = super().__setattr__
+        set_attribute("separator", separator)
+        set_attribute("root", FrozenNode.from_dict(nested))
+        set_attribute("split_path", path_splitter(separator))
+        set_attribute("_hash", None)
+        return
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("FrozenNestedDict is read-only")
+
+    def __getitem__(self, path: Union[str, tuple]):
+        """Gets the item at the end of the path
+
+        A path that ends at a level gets the FrozenNode for it.
+
+        Args:
+         path: the keys separated by the separator (or a tuple of keys)
+        """
+        parent = self.root
+        keys = path if type(path) is tuple else self.split_path(path)
+        for key in keys:
+            if type(parent) is not FrozenNode:
+                # same as the NestedDict, keys past a leaf are ignored
+                return parent
+            # FrozenNode.__getitem__ inlined, this is the hot loop
+            node_keys = parent.keys
+            index = bisect_left(node_keys, key)
+            if index == len(node_keys) or node_keys[index] != key:
+                raise KeyError(key)
+            parent = parent.values[index]
+        return parent
+
+    def thaw(self) -> NestedDict:
+        """A NestedDict copy of the tree"""
+        return NestedDict(separator=self.separator,
+                          dictionary=self.root.to_dict())
+
+    def iter_leaves(self) -> Iterator[Tuple[str, object]]:
+        """Generates the (path, value) pairs for the leaves"""
+        separator = self.separator
+        stack = [("", self.root.items())]
+        while stack:
+            prefix, items = stack[-1]
+            for key, value in items:
+                if type(value) is FrozenNode and len(value):
+                    stack.append((prefix + key + separator, value.items()))
+                    break
+                yield prefix + key, value
+            else:
+                stack.pop()
+        return
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not FrozenNestedDict:
+            return NotImplemented
+        return self.separator == other.separator and self.root == other.root
+
+    def __hash__(self) -> int:
+        # racing threads would just work out the same hash
+        if self._hash is None:
+            super().__setattr__("_hash", hash((self.separator, self.root)))
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"FrozenNestedDict({self.root.to_dict()})"
+
+
+def find_entry(data: MemoryMap, offset: int, count: int,
+               key: bytes) -> Union[int, None]:
+    """Binary-searches a node's entries for the key
+
+    Args:
+     data: the mapped file
+     offset: where the node starts
+     count: how many entries the node has
+     key: the utf-8 encoded key to find
+
+    Returns:
+     the index of the key's entry or None if it isn't there
+    """
+    start = offset + COUNT.size
+    unpack = ENTRY.unpack_from
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        key_offset, key_length, _, _ = unpack(data, start + middle * ENTRY.size)
+        found = data[key_offset:key_offset + key_length]
+        if found == key:
+            return middle
+        if found < key:
+            low = middle + 1
+        else:
+            high = middle
+    return None
+
+
+class TreeWriter:
+    """Writes the nodes of a tree in the binary format
+
+    The nodes are written children-first so each node can point back to
+    them, and each key is only written once.
+
+    Args:
+     writer: the open (binary) file to write to
+    """
+    def __init__(self, writer: BinaryIO) -> None:
+        self.writer = writer
+        self.keys = {}
+        return
+
+    def blob(self, data: bytes) -> int:
+        """Writes the length-prefixed bytes
+
+        Returns:
+         the offset to the blob
+        """
+        offset = self.writer.tell()
+        self.writer.write(LENGTH.pack(len(data)))
+        self.writer.write(data)
+        return offset
+
+    def key(self, key: bytes) -> int:
+        """Writes the key (unless it was already written)
+
+        Returns:
+         the offset to the key
+        """
+        if key not in self.keys:
+            self.keys[key] = self.writer.tell()
+            self.writer.write(key)
+        return self.keys[key]
+
+    def value(self, value: object) -> Tuple[int, bytes]:
+        """Writes the value (if it doesn't fit in an entry)
+
+        Returns:
+         the value-type and the 8 bytes for the entry
+        """
+        if type(value) is dict:
+            return ValueType.node, LENGTH.pack(self.node(value))
+        if value is None:
+            return ValueType.none, NOTHING
+        if value is False:
+            return ValueType.false, NOTHING
+        if value is True:
+            return ValueType.true, NOTHING
+        if type(value) is int and -2**63 <= value < 2**63:
+            return ValueType.integer, INTEGER.pack(value)
+        if type(value) is float:
+            return ValueType.float, FLOAT.pack(value)
+        if type(value) is str:
+            return ValueType.string, LENGTH.pack(
+                self.blob(value.encode("utf-8")))
+        if type(value) is bytes:
+            return ValueType.bytes, LENGTH.pack(self.blob(value))
+        return ValueType.pickle, LENGTH.pack(self.blob(pickle.dumps(value)))
+
+    def node(self, dictionary: dict) -> int:
+        """Writes the dictionary (and everything under it)
+
+        Returns:
+         the offset to the node
+        """
+        entries = sorted((key.encode("utf-8"), value)
+                         for key, value in dictionary.items())
+        packed = []
+        for key, value in entries:
+            value_type, payload = self.value(value)
+            packed.append(ENTRY.pack(self.key(key), len(key), value_type,
+                                     payload))
+        offset = self.writer.tell()
+        self.writer.write(COUNT.pack(len(packed)))
+        self.writer.write(b"".join(packed))
+        return offset
+
+
+class MappedNode(Mapping):
+    """A read-only view of one level of a tree in a mapped file
+
+    Nothing is read until it's asked for.
+
+    Args:
+     data: the mapped file
+     offset: where the node starts
+    """
+    __slots__ = ("data", "offset", "count")
+
+    def __init__(self, data: MemoryMap, offset: int) -> None:
+        self.data = data
+        self.offset = offset
+        self.count = COUNT.unpack_from(data, offset)[0]
+        return
+
+    def entry(self, index: int) -> tuple:
+        """The (key offset, key length, value-type, value-bytes) entry"""
+        return ENTRY.unpack_from(
+            self.data, self.offset + COUNT.size + index * ENTRY.size)
+
+    def key(self, index: int) -> str:
+        """The key for the entry"""
+        key_offset, key_length, _, _ = self.entry(index)
+        return self.data[key_offset:key_offset + key_length].decode("utf-8")
+
+    def value(self, index: int) -> object:
+        """The value for the entry"""
+        _, _, value_type, payload = self.entry(index)
+        if value_type == ValueType.node:
+            return MappedNode(self.data, LENGTH.unpack(payload)[0])
+        if value_type == ValueType.none:
+            return None
+        if value_type in (ValueType.false, ValueType.true):
+            return value_type == ValueType.true
+        if value_type == ValueType.integer:
+            return INTEGER.unpack(payload)[0]
+        if value_type == ValueType.float:
+            return FLOAT.unpack(payload)[0]
+        offset = LENGTH.unpack(payload)[0]
+        length = LENGTH.unpack_from(self.data, offset)[0]
+        start = offset + LENGTH.size
+        blob = self.data[start:start + length]
+        if value_type == ValueType.string:
+            return blob.decode("utf-8")
+        if value_type == ValueType.bytes:
+            return blob
+        return pickle.loads(blob)
+
+    def find(self, key: str) -> int:
+        """Binary-searches for the key
+
+        Returns:
+         the index of the key's entry
+
+        Raises:
+         KeyError: the key isn't in the node
+        """
+        index = find_entry(self.data, self.offset, self.count,
+                           key.encode("utf-8"))
+        if index is None:
+            raise KeyError(key)
+        return index
+
+    def __getitem__(self, key: str) -> object:
+        return self.value(self.find(key))
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.key(index) for index in range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def to_dict(self) -> dict:
+        """Reads the node (and the ones below it) into dicts"""
+        dictionary = {}
+        for index in range(self.count):
+            value = self.value(index)
+            if type(value) is MappedNode:
+                value = value.to_dict()
+            dictionary[self.key(index)] = value
+        return dictionary
+
+
+class MappedNestedDict:
+    """A read-only NestedDict that looks things up in a memory-mapped file
+
+    The file comes from NestedDict.save. Only the nodes on the path being
+    looked up get read, so opening even a huge tree is instant, and since the
+    pages come from the operating system's file cache every process that maps
+    the same file shares them.
+
+    Args:
+     path: the file the tree was saved to
+    """
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as reader:
+            self.data = MemoryMap(reader.fileno(), 0, access=ACCESS_READ)
+        magic, version, separator_length, root = HEADER.unpack_from(
+            self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{self.path} isn't a saved NestedDict")
+        self.separator = self.data[
+            HEADER.size:HEADER.size + separator_length].decode("utf-8")
+        self.split_path = path_splitter(self.separator)
+        self.root = MappedNode(self.data, root)
+        return
+
+    def __getitem__(self, path: Union[str, tuple]):
+        """Gets the item at the end of the path
+
+        A path that ends at a level gets the MappedNode for it.
+
+        Args:
+         path: the keys separated by the separator (or a tuple of keys)
+        """
+        keys = path if type(path) is tuple else self.split_path(path)
+        data = self.data
+        node = self.root
+        offset, count = node.offset, node.count
+        for depth, key in enumerate(keys):
+            index = find_entry(data, offset, count, key.encode("utf-8"))
+            if index is None:
+                raise KeyError(key)
+            _, _, value_type, payload = ENTRY.unpack_from(
+                data, offset + COUNT.size + index * ENTRY.size)
+            if value_type != ValueType.node or depth == len(keys) - 1:
+                # same as the NestedDict, keys past a leaf are ignored
+                return MappedNode(data, offset).value(index)
+            offset = LENGTH.unpack(payload)[0]
+            count = COUNT.unpack_from(data, offset)[0]
+        return node
+
+    def close(self) -> None:
+        """Closes the mapped file"""
+        self.data.close()
+        return
+
+    def __enter__(self) -> "MappedNestedDict":
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        self.close()
         return
@@ -6,18 +6,20 @@ from colorama import Style
 
 # this project
 from graeae.infrastructure.logging import SysLogBuilder
-from graeae.timers import Timer
+from graeae.timers import SamplingProfiler, Timer
 
 class SysLogBase:
-    """A parent class that adds a logger and a Timer
+    """A parent class that adds a logger, a Timer and a profiler
 
     UML:
      SysLogBase o-- logging.Logger
      SysLogBase o-- Timer     
+     SysLogBase o-- SamplingProfiler
     """
     def __init__(self) -> None:
         self._log = None
         self._timer = None
+        self._profiler = None
         self.message = "All is complete"
         self.syslog_format = ("%(asctime)s: %(levelname)s: (wicca) %(name)s:"
                              " %(funcName)s %(message)s")
@@ -38,5 +40,14 @@ class SysLogBase:
         if self._timer is None:
             self._timer = Timer(message=self.message,
                                 prefix=f"{Style.BRIGHT}{self.__class__.__name__}{Style.RESET_ALL}",
-                                output=self.log.info)
+                                output=self.log.info,
+                                name=self.__class__.__name__)
         return self._timer
+
+    @property
+    def profiler(self) -> SamplingProfiler:
+        """A sampling profiler that logs the hot functions"""
+        if self._profiler is None:
+            self._profiler = SamplingProfiler(output=self.log.info,
+                                              name=self.__class__.__name__)
+        return self._profiler
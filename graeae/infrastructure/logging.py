@@ -1,6 +1,10 @@
 # python
 from argparse import Namespace
 from pathlib import Path
+from queue import Full, Queue
+from threading import Lock
+from typing import Callable, Hashable
+import atexit
 import logging
 import logging.handlers
 
@@ -9,8 +13,96 @@ SysLogDefaults = Namespace(
     console_format="%(asctime)s %(name)s %(funcName)s: %(message)s",
     log_format=("%(asctime)s: %(levelname)s: %(name)s:"
                 " %(funcName)s %(message)s"),
+    queue_size=10000,
+    log_level=logging.DEBUG,
+    console_level=logging.INFO,
 )
 
+# the key for the console handlers (they don't have an address)
+CONSOLE = "<stderr>"
+
+
+class HandlerCache:
+    """Process-wide handlers and formatters
+
+    Loggers with the same configuration share one handler (and so one
+    syslog socket) and one formatter instead of each making their own.
+    """
+    def __init__(self) -> None:
+        self.formatters = {}
+        self.handlers = {}
+        self.lock = Lock()
+        return
+
+    def formatter(self, log_format: str) -> logging.Formatter:
+        """The shared formatter for the format
+
+        Args:
+         log_format: the %-style format string
+        """
+        formatter = self.formatters.get(log_format)
+        if formatter is None:
+            with self.lock:
+                formatter = self.formatters.setdefault(
+                    log_format, logging.Formatter(log_format))
+        return formatter
+
+    def handler(self, key: Hashable,
+                build: Callable[[], logging.Handler]) -> logging.Handler:
+        """The shared handler for the key (built if it's new)
+
+        Args:
+         key: the (address, format, level) for the handler
+         build: callable that makes the handler if it isn't cached yet
+        """
+        handler = self.handlers.get(key)
+        if handler is None:
+            with self.lock:
+                handler = self.handlers.get(key)
+                if handler is None:
+                    handler = self.handlers[key] = build()
+        return handler
+
+
+HANDLERS = HandlerCache()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a bounded queue, dropping or blocking when it's full
+
+    Args:
+     queue: where to put the records
+     block: if True wait for room instead of dropping the record
+    """
+    def __init__(self, queue: Queue, block: bool=False) -> None:
+        super().__init__(queue)
+        self.block = block
+        self.dropped = 0
+        return
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Puts the record on the queue (or counts it as dropped)"""
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+        return
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that waits for room for its stop-sentinel
+
+    The QueueListener uses put_nowait for the sentinel, which fails if
+    the queue is full when it's stopped.
+    """
+    def enqueue_sentinel(self) -> None:
+        """Puts the sentinel on the queue, waiting if it's full"""
+        self.queue.put(self._sentinel)
+        return
+
 
 class SysLogBuilder:
     """Builds a logger that writes to the screen and the system log
@@ -20,16 +112,36 @@ class SysLogBuilder:
      console_format: String Format for stdout
      log_format: string format for syslog
      address: sys-log address
+     use_queue: if True log through a queue to a background thread
+     queue_size: the most records the queue will hold
+     block: if True wait when the queue is full instead of dropping records
+     log_level: the lowest level to send to the system log
+     console_level: the lowest level to send to the console
+     shared: if True use the process-wide handlers and formatters
     """
     def __init__(self, name, 
                  console_format: str=SysLogDefaults.console_format,
                  log_format: str=SysLogDefaults.log_format,
                  address: str=SysLogDefaults.address,
+                 use_queue: bool=False,
+                 queue_size: int=SysLogDefaults.queue_size,
+                 block: bool=False,
+                 log_level: int=SysLogDefaults.log_level,
+                 console_level: int=SysLogDefaults.console_level,
+                 shared: bool=True,
     ) -> None:
         self.name = name
         self.console_format = console_format
         self.log_format = log_format
         self.address = address
+        self.use_queue = use_queue
+        self.queue_size = queue_size
+        self.block = block
+        self.log_level = log_level
+        self.console_level = console_level
+        self.shared = shared
+        self._queue_handler = None
+        self._listener = None
         self._sys_logger = None
         self._console_logger = None
         self._sys_formatter = None
@@ -37,45 +149,126 @@ class SysLogBuilder:
         self._logger = None
         return
 
+    def formatter(self, log_format: str) -> logging.Formatter:
+        """A (shared if shared is set) formatter
+
+        Args:
+         log_format: the %-style format string
+        """
+        if self.shared:
+            return HANDLERS.formatter(log_format)
+        return logging.Formatter(log_format)
+
+    def handler(self, key: tuple,
+                build: Callable[[], logging.Handler]) -> logging.Handler:
+        """A (shared if shared is set) handler
+
+        Args:
+         key: the (address, format, level) for the handler
+         build: callable that makes the handler
+        """
+        if self.shared:
+            return HANDLERS.handler(key, build)
+        return build()
+
     @property
     def sys_formatter(self) -> logging.Formatter:
         """Formatter for the system log"""
         if self._sys_formatter is None:
-            self._sys_formatter = logging.Formatter(self.log_format)
+            self._sys_formatter = self.formatter(self.log_format)
         return self._sys_formatter
 
+    def build_sys_logger(self) -> logging.handlers.SysLogHandler:
+        """Makes a new log-handler for the system-log"""
+        handler = logging.handlers.SysLogHandler(self.address)
+        handler.setFormatter(self.sys_formatter)
+        handler.setLevel(self.log_level)
+        return handler
+
     @property
     def sys_logger(self) -> logging.handlers.SysLogHandler:
         """Log-handler to send it to the system-log"""
         if self._sys_logger is None:
-            self._sys_logger = logging.handlers.SysLogHandler(self.address)
-            self._sys_logger.setFormatter(self.sys_formatter)
-            self._sys_logger.setLevel(logging.DEBUG)
+            address = self.address
+            if isinstance(address, list):
+                address = tuple(address)
+            self._sys_logger = self.handler(
+                (address, self.log_format, self.log_level),
+                self.build_sys_logger)
         return self._sys_logger
 
     @property
     def console_formatter(self) -> logging.Formatter:
         """Formatter for stdout"""
         if self._console_formatter is None:
-            self._console_formatter = logging.Formatter(self.console_format)
+            self._console_formatter = self.formatter(self.console_format)
         return self._console_formatter
+
+    def build_console_logger(self) -> logging.StreamHandler:
+        """Makes a new log-handler for stdout"""
+        handler = logging.StreamHandler()
+        handler.setFormatter(self.console_formatter)
+        handler.setLevel(self.console_level)
+        return handler
     
     @property
     def console_logger(self) -> logging.StreamHandler:
         """Log-Handler for stdout"""
         if self._console_logger is None:
-            self._console_logger = logging.StreamHandler()
-            self._console_logger.setFormatter(self.console_formatter)
-            self._console_logger.setLevel(logging.INFO)
+            self._console_logger = self.handler(
+                (CONSOLE, self.console_format, self.console_level),
+                self.build_console_logger)
         return self._console_logger
     
+    @property
+    def queue_handler(self) -> BoundedQueueHandler:
+        """Log-handler that puts the records on the queue"""
+        if self._queue_handler is None:
+            self._queue_handler = BoundedQueueHandler(
+                Queue(self.queue_size), block=self.block)
+        return self._queue_handler
+
+    @property
+    def listener(self) -> FlushingQueueListener:
+        """Sends the queued records to the handlers on a background thread"""
+        if self._listener is None:
+            self._listener = FlushingQueueListener(
+                self.queue_handler.queue,
+                self.sys_logger,
+                self.console_logger,
+                respect_handler_level=True)
+        return self._listener
+
     @property
     def logger(self) -> logging.Logger:
         """The logger"""
         if self._logger is None:
             self._logger = logging.getLogger(self.name)
             if not self._logger.handlers:
-                self._logger.addHandler(self.sys_logger)
-                self._logger.addHandler(self.console_logger)
+                if self.use_queue:
+                    self._logger.addHandler(self.queue_handler)
+                    self.listener.start()
+                    atexit.register(self.stop)
+                else:
+                    self._logger.addHandler(self.sys_logger)
+                    self._logger.addHandler(self.console_logger)
                 self._logger.setLevel(logging.DEBUG)
         return self._logger
+
+    def stop(self) -> None:
+        """Flushes the queue and stops the background thread
+
+        If records were dropped it logs how many (directly to the handlers).
+        """
+        if self._listener is None or self._listener._thread is None:
+            return
+        self._listener.stop()
+        if self.queue_handler.dropped:
+            record = logging.makeLogRecord(dict(
+                name=self.name, levelno=logging.WARNING,
+                levelname="WARNING", funcName="stop",
+                msg=(f"{self.queue_handler.dropped:,} log records were"
+                     " dropped because the queue was full")))
+            for handler in self._listener.handlers:
+                handler.handle(record)
+        return
@@ -1 +1,4 @@
 from .timer import Timer
+from .registry import Histogram, TimerRegistry
+from .spans import Span, Trace
+from .profiler import SamplingProfiler
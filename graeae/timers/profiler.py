@@ -0,0 +1,108 @@
+# python
+from collections import Counter
+from pathlib import Path
+from threading import Event, Thread, get_ident
+from types import CodeType
+from typing import Callable
+import sys
+
+# pypi
+from tabulate import tabulate
+
+
+class SamplingProfiler:
+    """Samples the stack of the thread that's profiling
+
+    A background thread looks at the profiled thread's current frame
+    every interval seconds and counts the functions it finds, so the
+    overhead depends on the interval, not on how many calls get made.
+
+    Args:
+     output: callable to send the table of hot functions to
+     name: what to call the profile in the output
+     interval: seconds between samples
+     top: how many functions to put in the table
+    """
+    def __init__(self, output: Callable=print, name: str="Profile",
+                 interval: float=0.01, top: int=10) -> None:
+        self.output = output
+        self.name = name
+        self.interval = interval
+        self.top = top
+        self.samples = 0
+        self.own = Counter()
+        self.total = Counter()
+        self.target = None
+        self.stopped = Event()
+        self.thread = None
+        return
+
+    def sample(self) -> None:
+        """Counts the functions on the target's stack until it's stopped"""
+        own, total = self.own, self.total
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            self.samples += 1
+            own[frame.f_code] += 1
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                if code not in seen:
+                    # only count recursive functions once per sample
+                    seen.add(code)
+                    total[code] += 1
+                frame = frame.f_back
+        return
+
+    def start(self) -> None:
+        """Starts sampling the thread that called this"""
+        self.samples = 0
+        self.own.clear()
+        self.total.clear()
+        self.target = get_ident()
+        self.stopped.clear()
+        self.thread = Thread(target=self.sample, daemon=True,
+                             name="graeae-profiler")
+        self.thread.start()
+        return
+
+    def stop(self) -> None:
+        """Stops sampling and sends the table to the output"""
+        self.stopped.set()
+        self.thread.join()
+        self.output(self.report())
+        return
+
+    def label(self, code: CodeType) -> str:
+        """The function's name, file and line
+
+        Args:
+         code: the function's code-object
+        """
+        return (f"{code.co_name} "
+                f"({Path(code.co_filename).name}:{code.co_firstlineno})")
+
+    def report(self) -> str:
+        """The table of the functions seen the most at the top of the stack"""
+        if not self.samples:
+            return f"{self.name}: no samples taken"
+        rows = [dict(Function=self.label(code),
+                     Samples=count,
+                     Own=f"{100 * count/self.samples:.1f}%",
+                     Total=f"{100 * self.total[code]/self.samples:.1f}%")
+                for code, count in self.own.most_common(self.top)]
+        return (f"{self.name}: {self.samples:,} samples"
+                f" every {1000 * self.interval:g} ms\n"
+                + tabulate(rows, headers="keys", tablefmt="orgtbl"))
+
+    def __enter__(self) -> "SamplingProfiler":
+        """Starts sampling"""
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        """Stops sampling and outputs the table"""
+        self.stop()
+        return
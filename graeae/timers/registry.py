@@ -0,0 +1,215 @@
+# python
+from math import ceil
+from threading import Lock
+from time import perf_counter_ns
+from typing import Callable, Iterable, Union
+import atexit
+
+# pypi
+from tabulate import tabulate
+
+# this project
+from graeae.timers.timer import Timer
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_MASK = (1 << SUB_BUCKET_BITS) - 1
+PERCENTILES = (50, 95, 99)
+UNITS = ((10**9, "s"), (10**6, "ms"), (10**3, "µs"))
+
+
+def format_nanoseconds(nanoseconds: Union[int, float]) -> str:
+    """Converts nanoseconds to a string with a readable unit
+
+    Args:
+     nanoseconds: the time to format
+    """
+    for size, unit in UNITS:
+        if nanoseconds >= size:
+            return f"{nanoseconds/size:,.2f} {unit}"
+    return f"{nanoseconds:,.0f} ns"
+
+
+class Histogram:
+    """A log-linear (HDR-style) histogram of nanoseconds
+
+    Each power of two gets split into 2**(SUB_BUCKET_BITS - 1) buckets so
+    the values it reports are within 1/64th (about 1.6%) of what was
+    recorded, no matter how big they are, and it only stores the buckets
+    that get used.
+    """
+    def __init__(self) -> None:
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.lock = Lock()
+        return
+
+    @property
+    def mean(self) -> float:
+        """The mean of the recorded values"""
+        return self.total/self.count if self.count else 0
+
+    def record(self, nanoseconds: int) -> None:
+        """Adds the value to the histogram
+
+        Args:
+         nanoseconds: the time to record
+        """
+        shift = nanoseconds.bit_length() - SUB_BUCKET_BITS
+        if shift < 0:
+            shift = 0
+        bucket = (shift << SUB_BUCKET_BITS) + (nanoseconds >> shift)
+        with self.lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total += nanoseconds
+            if self.minimum is None or nanoseconds < self.minimum:
+                self.minimum = nanoseconds
+            if self.maximum is None or nanoseconds > self.maximum:
+                self.maximum = nanoseconds
+        return
+
+    def value(self, bucket: int) -> int:
+        """The highest value that goes in the bucket
+
+        Args:
+         bucket: the index of the bucket
+        """
+        shift = bucket >> SUB_BUCKET_BITS
+        return (((bucket & SUB_BUCKET_MASK) + 1) << shift) - 1
+
+    def percentile(self, percent: float) -> int:
+        """The value that the percent of the recorded values are at or below
+
+        Args:
+         percent: number from 0 to 100
+        """
+        if not self.count:
+            return 0
+        rank = max(ceil(percent/100 * self.count), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.value(bucket), self.maximum)
+        return self.maximum
+
+    def merge(self, other: "Histogram") -> None:
+        """Adds another histogram's counts to this one
+
+        Args:
+         other: the histogram to add
+        """
+        with self.lock:
+            for bucket, count in other.counts.items():
+                self.counts[bucket] = self.counts.get(bucket, 0) + count
+            self.count += other.count
+            self.total += other.total
+            for value in (other.minimum, other.maximum):
+                if value is None:
+                    continue
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+        return
+
+    def statistics(self) -> dict:
+        """The count, mean, percentiles and max"""
+        statistics = dict(count=self.count, mean=self.mean)
+        for percent in PERCENTILES:
+            statistics[f"p{percent}"] = self.percentile(percent)
+        statistics["max"] = self.maximum or 0
+        return statistics
+
+
+class TimerRegistry:
+    """Keeps a histogram of the times for each named timer
+
+    Args:
+     output: callable to send the report to
+     container: Is this a container, not a full PC?
+     report_at_exit: if True, emit the report when python exits
+     clock: callable that returns the current time in nanoseconds
+    """
+    def __init__(self, output: Callable=None, container: bool=True,
+                 report_at_exit: bool=False,
+                 clock: Callable[[], int]=perf_counter_ns) -> None:
+        self.container = container
+        self.clock = clock
+        self._output = output
+        self.histograms = {}
+        self.lock = Lock()
+        if report_at_exit:
+            atexit.register(self.emit)
+        return
+
+    @property
+    def output(self) -> Callable:
+        """The object to output the report"""
+        if self._output is None:
+            # use the same output a Timer would
+            self._output = Timer(container=self.container).output
+        return self._output
+
+    def __getitem__(self, name: str) -> Histogram:
+        """The histogram for the name (created if it's new)"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def timer(self, name: str) -> Timer:
+        """A silent timer that adds its elapsed time to the name's histogram
+
+        Args:
+         name: the name to record the time under
+        """
+        return Timer(raw=True, clock=self.clock, histogram=self[name])
+
+    def record(self, name: str, nanoseconds: int) -> None:
+        """Adds a time that was measured some other way
+
+        Args:
+         name: the name to record the time under
+         nanoseconds: the time to record
+        """
+        self[name].record(nanoseconds)
+        return
+
+    def statistics(self, names: Iterable[str]=None) -> dict:
+        """Map of name to statistics
+
+        Args:
+         names: the timers to get (all of them if not set)
+        """
+        names = sorted(self.histograms) if names is None else names
+        return {name: self[name].statistics() for name in names}
+
+    def report(self, names: Iterable[str]=None) -> str:
+        """An org-table of the statistics
+
+        Args:
+         names: the timers to report (all of them if not set)
+        """
+        rows = []
+        for name, statistics in self.statistics(names).items():
+            row = dict(Timer=name, Count=f"{statistics.pop('count'):,}")
+            for label, value in statistics.items():
+                row[label.title() if label.isalpha() else label] = (
+                    format_nanoseconds(value))
+            rows.append(row)
+        return tabulate(rows, headers="keys", tablefmt="orgtbl")
+
+    def emit(self, names: Iterable[str]=None) -> None:
+        """Sends the report to the output (if anything was timed)
+
+        Args:
+         names: the timers to report (all of them if not set)
+        """
+        if self.histograms:
+            self.output(self.report(names))
+        return
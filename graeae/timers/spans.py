@@ -0,0 +1,169 @@
+# python
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from threading import get_ident
+from typing import Iterator, Union
+import json
+import os
+
+NANOSECONDS_PER_MICROSECOND = 1000
+
+
+class Span:
+    """One timed section, with the sections that were timed inside of it
+
+    Args:
+     name: what to call the span
+     start_ns: when it started (nanoseconds)
+     parent: the span this one was started inside of
+    """
+    __slots__ = ("name", "start_ns", "end_ns", "parent", "children",
+                 "thread")
+
+    def __init__(self, name: str, start_ns: int,
+                 parent: "Span"=None) -> None:
+        self.name = name
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.parent = parent
+        self.children = []
+        self.thread = get_ident()
+        return
+
+    @property
+    def duration_ns(self) -> int:
+        """Nanoseconds from start to end"""
+        return self.end_ns - self.start_ns
+
+    @property
+    def self_ns(self) -> int:
+        """Nanoseconds that weren't spent in the (finished) children"""
+        children = sum(child.duration_ns for child in self.children
+                       if child.end_ns is not None)
+        return max(self.duration_ns - children, 0)
+
+    @property
+    def stack(self) -> str:
+        """The semicolon-separated names from the root to this span"""
+        names = []
+        span = self
+        while span is not None:
+            names.append(span.name.replace(";", ":"))
+            span = span.parent
+        return ";".join(reversed(names))
+
+    def close(self, end_ns: int) -> None:
+        """Ends the span and makes its parent the current span again
+
+        Args:
+         end_ns: when it ended
+        """
+        self.end_ns = end_ns
+        CURRENT_SPAN.set(self.parent)
+        return
+
+    def walk(self) -> Iterator["Span"]:
+        """Generator of this span and all the spans under it"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+        return
+
+
+# the trace that timers add their spans to (if there is one)
+TRACE = ContextVar("timer_trace", default=None)
+
+# the span that new spans become the children of
+CURRENT_SPAN = ContextVar("timer_span", default=None)
+
+
+class Trace:
+    """Collects the spans for the timers started while it's active
+
+    Use it as a context manager, every Timer started inside the with-block
+    (in the same thread, or in tasks created inside it) adds a span, and a
+    timer started while another one is running becomes its child.
+    """
+    def __init__(self) -> None:
+        self.roots = []
+        self._token = None
+        return
+
+    def open(self, name: str, start_ns: int) -> Span:
+        """Starts a span as a child of the current span
+
+        Args:
+         name: what to call the span
+         start_ns: when it started
+        """
+        parent = CURRENT_SPAN.get()
+        span = Span(name, start_ns, parent)
+        if parent is None:
+            self.roots.append(span)
+        else:
+            parent.children.append(span)
+        CURRENT_SPAN.set(span)
+        return span
+
+    @property
+    def spans(self) -> Iterator[Span]:
+        """Generator of all the spans that have ended"""
+        for root in self.roots:
+            for span in root.walk():
+                if span.end_ns is not None:
+                    yield span
+        return
+
+    def collapsed(self) -> str:
+        """The spans as collapsed stacks for flamegraph tools
+
+        Each line is the semicolon-separated stack followed by the
+        microseconds spent in the last span of it (not its children).
+        """
+        totals = defaultdict(int)
+        for span in self.spans:
+            totals[span.stack] += span.self_ns
+        return "\n".join(
+            f"{stack} {nanoseconds//NANOSECONDS_PER_MICROSECOND}"
+            for stack, nanoseconds in totals.items())
+
+    def chrome_trace(self) -> dict:
+        """The spans as Chrome trace-event complete ('X') events"""
+        spans = list(self.spans)
+        origin = min((span.start_ns for span in spans), default=0)
+        process = os.getpid()
+        events = [dict(name=span.name, ph="X", pid=process, tid=span.thread,
+                       ts=(span.start_ns - origin)/NANOSECONDS_PER_MICROSECOND,
+                       dur=span.duration_ns/NANOSECONDS_PER_MICROSECOND)
+                  for span in spans]
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def save_collapsed(self, path: Union[str, Path]) -> None:
+        """Writes the collapsed stacks to a file
+
+        Args:
+         path: where to save it
+        """
+        Path(path).write_text(self.collapsed() + "\n")
+        return
+
+    def save_chrome_trace(self, path: Union[str, Path]) -> None:
+        """Writes the chrome trace-event JSON (for chrome://tracing)
+
+        Args:
+         path: where to save it
+        """
+        with open(path, "w") as writer:
+            json.dump(self.chrome_trace(), writer)
+        return
+
+    def __enter__(self) -> "Trace":
+        """Makes this the active trace"""
+        self._token = TRACE.set(self)
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        """Stops collecting spans"""
+        TRACE.reset(self._token)
+        return
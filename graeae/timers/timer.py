@@ -1,35 +1,135 @@
 # python
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import wraps
+from inspect import iscoroutinefunction
+from queue import SimpleQueue
+from threading import Lock, Thread
+from time import perf_counter_ns
 from typing import Callable
-
-# pypi
-try:
-    import pyttsx3
-    SPEAKABLE = True
-except ImportError:
-    # pyttsx3 will install even when there's no package installed for
-    # it to run (meaning espeak), so this isn't really going to work
-    # unless you're careful not to install it
-    print("pyttsx3 not available")
-    SPEAKABLE = False
+import atexit
 
 # this project
 from graeae.infrastructure import SysLogBuilder
+from graeae.timers.spans import NANOSECONDS_PER_MICROSECOND, TRACE
+
+
+def to_timedelta(nanoseconds: int) -> timedelta:
+    """Converts nanoseconds to a timedelta (which only goes to microseconds)
+
+    Args:
+     nanoseconds: the span of time to convert
+    """
+    return timedelta(microseconds=nanoseconds/NANOSECONDS_PER_MICROSECOND)
+
+
+class TimerRun:
+    """The times for one start-to-end of a Timer"""
+    __slots__ = ("started", "ended", "start_ns", "end_ns", "last_lap_ns",
+                 "laps", "span")
+
+    def __init__(self) -> None:
+        self.started = None
+        self.ended = None
+        self.start_ns = None
+        self.end_ns = None
+        self.last_lap_ns = None
+        self.laps = []
+        self.span = None
+        return
 
 
-if not SPEAKABLE:
-    class EngineMock:
-        """A fake engine"""
+# map of timer to the stack of its runs that haven't ended yet
+# this is never changed in place, it gets copied and set so that each
+# task (or thread) only sees its own runs
+RUNS = ContextVar("timer_runs", default={})
 
-    class pyttsx3:
-        """A fake module"""
-        engine = EngineMock
-        engine.Engine = None
+
+def run_attribute(name: str) -> property:
+    """Makes a read-only property for the timer's current run
+
+    Args:
+     name: the TimerRun attribute to get
+    """
+    return property(lambda self: getattr(self.run, name),
+                    doc=f"The {name} for the current (or last) run")
+
+
+class Speaker:
+    """Says things on a background thread
+
+    pyttsx3 doesn't get imported until something gets said, and the
+    engine is created and run on the speaker's thread so saying
+    something doesn't block the caller.
+
+    Args:
+     timeout: seconds to wait for the queue to empty when python exits
+    """
+    def __init__(self, timeout: float=10) -> None:
+        self.timeout = timeout
+        self.messages = SimpleQueue()
+        self.lock = Lock()
+        self.thread = None
+        self.speakable = None
+        return
+
+    def say(self, message: str) -> None:
+        """Adds the message to the queue (and starts the thread if needed)
+
+        Args:
+         message: what to say
+        """
+        if self.speakable is False:
+            return
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = Thread(target=self.run, daemon=True,
+                                         name="graeae-speaker")
+                    self.thread.start()
+                    atexit.register(self.close)
+        self.messages.put(message)
+        return
+
+    def run(self) -> None:
+        """Says the messages in the queue until it gets None"""
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+        except Exception as error:
+            # pyttsx3 will install even when there's no package installed
+            # for it to run (meaning espeak), so this can fail even when
+            # the import works
+            print(f"pyttsx3 not available: {error}")
+            self.speakable = False
+            return
+        self.speakable = True
+        message = self.messages.get()
+        while message is not None:
+            engine.say(message)
+            engine.runAndWait()
+            message = self.messages.get()
+        engine.stop()
+        return
+
+    def close(self) -> None:
+        """Waits for the queued messages to be said and stops the thread"""
+        if self.thread is not None and self.thread.is_alive():
+            self.messages.put(None)
+            self.thread.join(self.timeout)
+        return
+
+
+SPEAKER = Speaker()
 
 
 class Timer:
     """Emits the time between calling start and end
 
+    The elapsed times come from a monotonic nanosecond clock
+    (perf_counter_ns by default), the wall-clock times are only used for
+    the output.
+
     Args:
      speak: If true, say something at the end
      message: what to say
@@ -37,23 +137,57 @@ class Timer:
      emit: if False, just stores the times
      output: callable to send the output to
      container: Is this a container, not a full PC?
+     raw: if True only store the clock's integers (no output or speech)
+     clock: callable that returns the current time in nanoseconds
+     histogram: something with a record method to send the elapsed time to
+     name: what to call the timer's spans when there's an active Trace
     """
     def __init__(self, speak: bool=True, message: str="All Done",
                  prefix: str = "",
-                 emit:bool=True, output=None, container: bool=True) -> None:
+                 emit:bool=True, output=None, container: bool=True,
+                 raw: bool=False,
+                 clock: Callable[[], int]=perf_counter_ns,
+                 histogram=None, name: str=None) -> None:
         self.speak = speak
         self.message = message
         self.emit = emit
         self.prefix = prefix
+        self.name = name or prefix or message
         if self.prefix:
             self.prefix = f"({prefix}) "
         self.container = container
+        self.raw = raw
+        self.clock = clock
+        self.histogram = histogram
         self._output = output
-        self._speaker = None
-        self.started = None
-        self.ended = None
+        self.last_run = TimerRun()
         return
 
+    started = run_attribute("started")
+    ended = run_attribute("ended")
+    start_ns = run_attribute("start_ns")
+    end_ns = run_attribute("end_ns")
+    last_lap_ns = run_attribute("last_lap_ns")
+    laps = run_attribute("laps")
+
+    @property
+    def run(self) -> TimerRun:
+        """This context's latest run that hasn't ended (or the last run)"""
+        runs = RUNS.get().get(self)
+        return runs[-1] if runs else self.last_run
+
+    @property
+    def elapsed_ns(self) -> int:
+        """Nanoseconds from start to end (or to now if it's still running)"""
+        run = self.run
+        end = run.end_ns if run.end_ns is not None else self.clock()
+        return end - run.start_ns
+
+    @property
+    def elapsed(self) -> timedelta:
+        """The elapsed time as a timedelta"""
+        return to_timedelta(self.elapsed_ns)
+
     @property
     def output(self) -> Callable:
         """The object to output the strings"""
@@ -65,33 +199,107 @@ class Timer:
         return self._output
 
     @property
-    def speaker(self) -> pyttsx3.engine.Engine:
-        """The espeak speaker"""
-        if self._speaker is None:
-            self._speaker = pyttsx3.init()
-        return self._speaker
+    def speaker(self) -> Speaker:
+        """The (shared) background speaker"""
+        return SPEAKER
 
     def start(self) -> None:
         """Sets the started time"""
-        self.started = datetime.now()
-        if self.emit:
-            self.output(f"{self.prefix}Started: {self.started}")
+        run = TimerRun()
+        runs = RUNS.get().copy()
+        runs[self] = runs.get(self, ()) + (run,)
+        RUNS.set(runs)
+        if not self.raw:
+            run.started = datetime.now()
+            if self.emit:
+                self.output(f"{self.prefix}Started: {run.started}")
+        # get the clock last so the output isn't part of the time
+        run.start_ns = run.last_lap_ns = self.clock()
+        trace = TRACE.get()
+        if trace is not None:
+            run.span = trace.open(self.name, run.start_ns)
         return
 
+    def lap(self) -> int:
+        """Stores and returns the nanoseconds since the last lap (or start)"""
+        now = self.clock()
+        run = self.run
+        lap = now - run.last_lap_ns
+        run.last_lap_ns = now
+        run.laps.append(lap)
+        if self.emit and not self.raw:
+            self.output(f"{self.prefix}Lap {len(run.laps)}: "
+                        f"{to_timedelta(lap)}")
+        return lap
+
+    def split(self) -> int:
+        """Returns the nanoseconds since start without stopping the timer"""
+        split = self.clock() - self.run.start_ns
+        if self.emit and not self.raw:
+            self.output(f"{self.prefix}Split: {to_timedelta(split)}")
+        return split
+
     def end(self) -> None:
-        """Emits the end and elapsed time"""
-        self.ended = datetime.now()
+        """Emits the end and elapsed time
+
+        Raises:
+         RuntimeError: the timer wasn't started in this context
+        """
+        # get the clock first so the output isn't part of the time
+        now = self.clock()
+        runs = RUNS.get().copy()
+        stack = runs.pop(self, None)
+        if not stack:
+            raise RuntimeError(f"{self.prefix}Timer ended without starting")
+        if len(stack) > 1:
+            runs[self] = stack[:-1]
+        RUNS.set(runs)
+        run = self.last_run = stack[-1]
+        run.end_ns = now
+        if run.span is not None:
+            run.span.close(now)
+        if self.histogram is not None:
+            self.histogram.record(now - run.start_ns)
+        if self.raw:
+            return
+        run.ended = datetime.now()
         if self.emit:
-            self.output(f"{self.prefix}Ended: {self.ended}")
-            self.output(f"{self.prefix}Elapsed: {self.ended - self.started}")
-        if SPEAKABLE and self.speak and not self.container:
+            self.output(f"{self.prefix}Ended: {run.ended}")
+            self.output(f"{self.prefix}Elapsed: {self.elapsed}")
+        if self.speak and not self.container:
             self(self.message)
         return
-    
-    def __call__(self, message: str) -> None:
-        """Sends a message to the speaker"""
+
+    def decorate(self, function: Callable) -> Callable:
+        """Wraps the function (or coroutine function) so calls get timed
+
+        Args:
+         function: the function to time
+
+        Returns:
+         the timed version of the function
+        """
+        if iscoroutinefunction(function):
+            @wraps(function)
+            async def timed(*args, **kwargs):
+                async with self:
+                    return await function(*args, **kwargs)
+        else:
+            @wraps(function)
+            def timed(*args, **kwargs):
+                with self:
+                    return function(*args, **kwargs)
+        return timed
+
+    def __call__(self, message):
+        """Sends a message to the speaker (or decorates a function)
+
+        Args:
+         message: what to say or a function to time
+        """
+        if callable(message):
+            return self.decorate(message)
         self.speaker.say(message)
-        self.speaker.runAndWait()
         return
 
     stop = end
@@ -106,11 +314,12 @@ class Timer:
         self.end()
         return
 
-    def __del__(self) -> None:
-        """Stops the speaker"""
-        try:
-            if not self.container:
-                self.speaker.stop()
-        except Exception as error:
-            print(f"unable to stop the speaker: {error}")
+    async def __aenter__(self):
+        """Starts the timer"""
+        self.start()
+        return self
+
+    async def __aexit__(self, type, value, traceback) -> None:
+        """Stops the timer"""
+        self.end()
         return
@@ -119,8 +119,48 @@ contextual information."
 ;; Export function used by Nikola.
 (defun nikola-html-export (infile outfile)
   "Export the body only of the input file and write it to
-specified location."
+specified location. Returns non-nil if the HTML has shortcodes in
+it, so Nikola can skip the ones that don't."
   (with-current-buffer (find-file infile)
     (org-macro-replace-all nikola-macro-templates)
     (org-html-export-as-html nil nil t t)
-    (write-file outfile nil)))
+    (write-file outfile nil)
+    (save-excursion
+      (goto-char (point-min))
+      (search-forward "{{%" nil t))))
+
+;; Export function that reports back to the plugin.
+(defun nikola-html-export-timed (infile outfile)
+  "Run `nikola-html-export' and return a string with the seconds
+it took, followed by `shortcodes' if the HTML has shortcodes."
+  (let* ((start (float-time))
+         (shortcodes (nikola-html-export infile outfile)))
+    (format "%f%s" (- (float-time) start) (if shortcodes " shortcodes" ""))))
+
+;; Server loop used by the persistent worker pool.
+(defun nikola-html-export-server ()
+  "Read export requests from stdin and answer each one on stdout.
+Each request is a line holding a list with the input and output
+file names. Each answer is a line starting with `nikola-ok' or
+`nikola-error', `nikola-ok' is followed by the report from
+`nikola-html-export-timed'. The loop ends when stdin is closed."
+  (princ "nikola-ready\n")
+  (let (line)
+    (while (setq line (ignore-errors (read-from-minibuffer "")))
+      (let ((buffers (buffer-list)))
+        (condition-case err
+            (let ((request (read line)))
+              (princ (format "nikola-ok %s\n"
+                             (nikola-html-export-timed
+                              (nth 0 request) (nth 1 request)))))
+          (error (let ((print-escape-newlines t))
+                   (princ (format "nikola-error %S\n" err)))))
+        ;; Don't let the visited files pile up between requests, the
+        ;; org buffer was changed by the macros so drop the changes
+        ;; first or `kill-buffer' would ask about them.
+        (let ((kill-buffer-query-functions nil))
+          (dolist (buffer (buffer-list))
+            (unless (memq buffer buffers)
+              (with-current-buffer buffer
+                (set-buffer-modified-p nil))
+              (kill-buffer buffer))))))))
@@ -31,10 +31,19 @@ You will need to install emacs and org-mode (v8.x or greater).
 """
 
 from __future__ import unicode_literals
+import atexit
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 import io
+import json
 import os
 from os.path import abspath, dirname, join
+import shutil
 import subprocess
+import tempfile
+import threading
+from timeit import default_timer
 
 try:
     from collections import OrderedDict
@@ -50,39 +59,517 @@ try:
 except ImportError:
     write_metadata = None  # NOQA
 
+PLUGIN_FOLDER = dirname(abspath(__file__))
+INIT_FILE = join(PLUGIN_FOLDER, 'init.el')
+# the files that change what emacs makes of a post
+EMACS_CONFIGURATION = [join(PLUGIN_FOLDER, name)
+                       for name in ('init.el', 'conf.el', 'macros.org')]
+
+
+def elisp_string(text):
+    """Quote text as an emacs-lisp string literal."""
+    return '"{0}"'.format(text.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+# what an export did: whether the post came from the cache, whether the
+# HTML has shortcodes and the seconds spent starting emacs and exporting
+ExportResult = namedtuple('ExportResult', 'cached shortcodes startup export')
+CACHED = ExportResult(True, False, 0.0, 0.0)
+
+
+def parse_report(report, startup):
+    """Build the ExportResult from `nikola-html-export-timed`'s report."""
+    fields = report.split()
+    return ExportResult(False, 'shortcodes' in fields[1:], startup,
+                        float(fields[0]))
+
+
+def write_atomically(path, data):
+    """Write the bytes to a temporary file next to path and rename it."""
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    try:
+        with io.open(handle, 'wb') as writer:
+            writer.write(data)
+        if os.path.exists(path):
+            # mkstemp makes the file private, keep the old permissions
+            shutil.copymode(path, temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class EmacsWorkerError(Exception):
+    """ The emacs worker died or never got ready. """
+
+
+class EmacsExportError(Exception):
+    """ The emacs worker is fine but the export itself failed. """
+
+
+class EmacsWorker(object):
+    """ A long-lived emacs with init.el loaded that answers export requests.
+
+    The worker runs `nikola-html-export-server` (see init.el), which reads
+    one request per line from stdin and answers each one on stdout.
+
+    Args:
+     max_jobs: number of exports before the worker wants to be recycled
+    """
+
+    def __init__(self, max_jobs=None):
+        self.max_jobs = max_jobs
+        self.jobs = 0
+        self.process = None
+        self.startup = None
+
+    def start(self):
+        """Start emacs and wait until it has loaded init.el."""
+        started = default_timer()
+        self.process = subprocess.Popen(
+            ['emacs', '--batch', '-l', INIT_FILE,
+             '--eval', '(nikola-html-export-server)'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True, encoding='utf-8')
+        # conf.el might print things of its own, skip them
+        for line in self.process.stdout:
+            if line.strip() == 'nikola-ready':
+                self.startup = default_timer() - started
+                return self
+        self.stop()
+        raise EmacsWorkerError(
+            'emacs exited while loading {0}'.format(INIT_FILE))
+
+    @property
+    def alive(self):
+        """Whether the emacs process is still running."""
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def expired(self):
+        """Whether the worker has done all the jobs it's allowed to."""
+        return self.max_jobs is not None and self.jobs >= self.max_jobs
+
+    def export(self, source, dest):
+        """Have emacs export source to dest.
+
+        The worker's startup time is only charged to its first export.
+
+        Returns:
+         ExportResult
+        """
+        self.jobs += 1
+        try:
+            self.process.stdin.write('({0} {1})\n'.format(
+                elisp_string(abspath(source)), elisp_string(abspath(dest))))
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (IOError, ValueError) as error:
+            raise EmacsWorkerError('emacs went away ({0})'.format(error))
+        if not line:
+            raise EmacsWorkerError(
+                'emacs exited (return code {0})'.format(self.process.wait()))
+        status, _, message = line.rstrip('\n').partition(' ')
+        if status != 'nikola-ok':
+            raise EmacsExportError(message or line)
+        return parse_report(message, self.startup if self.jobs == 1 else 0.0)
+
+    def stop(self):
+        """Close stdin so the server loop ends and emacs exits."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (IOError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self.process = None
+
+
+class EmacsPool(object):
+    """ A bounded pool of emacs workers that are started as needed.
+
+    A worker goes back to the pool after each export unless it crashed or
+    did `max_jobs` exports, then it's stopped and a fresh one takes its place
+    the next time one is needed.
+
+    Args:
+     size: most workers to run at the same time
+     max_jobs: exports each worker does before it is recycled
+    """
+
+    def __init__(self, size, max_jobs=None):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _acquire(self):
+        """Get an idle worker or start a new one."""
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return EmacsWorker(self.max_jobs).start()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker):
+        """Put the worker back in the pool or retire it."""
+        if worker.alive and not worker.expired:
+            with self._lock:
+                self._idle.append(worker)
+        else:
+            worker.stop()
+        self._slots.release()
+
+    def export(self, source, dest):
+        """Export source to dest on one of the workers.
+
+        A worker that dies mid-export is replaced and the export is tried
+        once more on the fresh worker.
+
+        Returns:
+         ExportResult
+        """
+        for attempt in (1, 2):
+            worker = self._acquire()
+            try:
+                return worker.export(source, dest)
+            except EmacsWorkerError:
+                worker.stop()
+                if attempt == 2:
+                    raise
+            finally:
+                self._release(worker)
+
+    def close(self):
+        """Stop all the idle workers."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+class CompileCache(object):
+    """ An on-disk cache of compiled posts keyed by a hash of their inputs.
+
+    The key covers the source, the language, init.el, conf.el, macros.org
+    and the emacs version. Each entry is the compiled HTML plus a JSON list
+    of its shortcode dependencies. An entry is also treated as stale if one
+    of its dependencies changed after it was stored. Once the entries take up
+    more than `max_size` bytes the least recently used ones are removed.
+
+    Args:
+     folder: where to keep the entries
+     max_size: most bytes of HTML to keep
+    """
+
+    def __init__(self, folder, max_size):
+        self.folder = folder
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._configuration = None
+        self._size = None
+
+    @property
+    def configuration(self):
+        """Hash of everything outside the post that changes its output."""
+        if self._configuration is None:
+            digest = hashlib.sha256()
+            digest.update(subprocess.check_output(['emacs', '--version']))
+            for path in EMACS_CONFIGURATION:
+                if os.path.isfile(path):
+                    with io.open(path, 'rb') as reader:
+                        digest.update(reader.read())
+            self._configuration = digest.hexdigest()
+        return self._configuration
+
+    def key(self, source, lang=None):
+        """The cache key for the source file."""
+        digest = hashlib.sha256(self.configuration.encode('utf-8'))
+        digest.update('{0}\0'.format(lang).encode('utf-8'))
+        with io.open(source, 'rb') as reader:
+            digest.update(reader.read())
+        return digest.hexdigest()
+
+    def _paths(self, key):
+        """The HTML and dependency files for the key."""
+        base = join(self.folder, key)
+        return base + '.html', base + '.json'
+
+    def get(self, key, dest):
+        """Copy the cached HTML for key to dest.
+
+        Returns:
+         the shortcode dependencies or None if there's no fresh entry
+        """
+        html, deps = self._paths(key)
+        try:
+            stored = os.path.getmtime(html)
+            with io.open(deps, 'r', encoding='utf-8') as reader:
+                dependencies = json.load(reader)
+        except (OSError, IOError, ValueError):
+            return None
+        for dependency in dependencies:
+            if (os.path.isfile(dependency)
+                    and os.path.getmtime(dependency) > stored):
+                return None
+        makedirs(os.path.dirname(dest))
+        try:
+            shutil.copyfile(html, dest)
+            # the mtime is the LRU clock
+            os.utime(html, None)
+        except (OSError, IOError):
+            # evicted by another thread since the check
+            return None
+        return dependencies
+
+    def put(self, key, dest, dependencies):
+        """Store the compiled dest and its dependencies under key."""
+        makedirs(self.folder)
+        html, deps = self._paths(key)
+        with io.open(dest, 'rb') as reader:
+            write_atomically(html, reader.read())
+        write_atomically(deps, json.dumps(dependencies).encode('utf-8'))
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += os.path.getsize(html)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        """(mtime, size, key) for every entry in the cache."""
+        for name in os.listdir(self.folder):
+            if name.endswith('.html'):
+                stat = os.stat(join(self.folder, name))
+                yield stat.st_mtime, stat.st_size, name[:-len('.html')]
+
+    def _evict(self):
+        """Remove the least recently used entries until under max_size."""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if self._size <= self.max_size:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size -= size
+
+
+class CompileProfile(object):
+    """ Per-post compile timings, written out as JSON lines.
+
+    Each record has the post's source, dest and language, whether it came
+    from the cache or had shortcodes, the seconds spent starting emacs,
+    exporting and applying shortcodes (and their total) and the sizes of the
+    source and the HTML in bytes.
+
+    Args:
+     path: file to write the records to
+     slowest: how many posts `slowest` returns
+    """
+
+    def __init__(self, path, slowest=10):
+        self.path = path
+        self.count = slowest
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, **record):
+        """Add the record for one post."""
+        with self._lock:
+            self.records.append(record)
+
+    def slowest(self):
+        """The records of the posts that took the longest."""
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record['total'],
+                             reverse=True)
+        return records[:self.count]
+
+    def write(self):
+        """Write the records to the path, one JSON object per line."""
+        makedirs(os.path.dirname(self.path))
+        with self._lock, io.open(self.path, 'w', encoding='utf-8') as writer:
+            for record in self.records:
+                writer.write(json.dumps(record) + '\n')
+
 
 class CompileOrgmode(PageCompiler):
     """ Compile org-mode markup into HTML using emacs. """
 
     name = "orgmode"
+    _pool = None
+    _cache = None
+    _profile = None
+
+    @property
+    def pool(self):
+        """The emacs worker pool (None unless ORGMODE_EMACS_WORKERS is set)."""
+        workers = self.site.config.get('ORGMODE_EMACS_WORKERS', 0)
+        if self._pool is None and workers:
+            self._pool = EmacsPool(
+                workers,
+                self.site.config.get('ORGMODE_EMACS_MAX_JOBS', 100))
+            atexit.register(self._pool.close)
+        return self._pool
+
+    @property
+    def cache(self):
+        """The compile cache (None if ORGMODE_CACHE_SIZE is 0)."""
+        size = self.site.config.get('ORGMODE_CACHE_SIZE', 256 * 2**20)
+        if self._cache is None and size:
+            self._cache = CompileCache(
+                join(self.site.config.get('CACHE_FOLDER', 'cache'), 'orgmode'),
+                size)
+        return self._cache
+
+    @property
+    def profile(self):
+        """The compile profile (None unless ORGMODE_PROFILE is set)."""
+        path = self.site.config.get('ORGMODE_PROFILE')
+        if self._profile is None and path:
+            self._profile = CompileProfile(
+                path, self.site.config.get('ORGMODE_PROFILE_SLOWEST', 10))
+            atexit.register(self.write_profile)
+        return self._profile
+
+    def write_profile(self):
+        """Write the profile and log the slowest posts."""
+        self.profile.write()
+        self.logger.info("Slowest org posts (seconds, see {0}):".format(
+            self.profile.path))
+        for record in self.profile.slowest():
+            self.logger.info(
+                "{total:8.3f} {source} (startup {startup:.3f}, export "
+                "{export:.3f}, shortcodes {shortcodes:.3f}){0}".format(
+                    " cached" if record['cached'] else "", **record))
+
+    def export(self, source, dest):
+        """Run emacs to export source as HTML to dest.
+
+        Returns:
+         ExportResult
+        """
+        if self.pool is not None:
+            return self.pool.export(source, dest)
+        command = [
+            'emacs', '--batch',
+            '-l', INIT_FILE,
+            '--eval', '(princ (nikola-html-export-timed "{0}" "{1}"))'.format(
+                abspath(source), abspath(dest))
+        ]
+
+        # Dirty walkaround for this plugin to run on Windows platform.
+        if os.name == 'nt':
+            command[5] = command[5].replace("\\", "\\\\")
+
+        started = default_timer()
+        report = subprocess.check_output(command, universal_newlines=True)
+        result = parse_report(report, 0.0)
+        # whatever emacs didn't spend exporting went to starting up
+        return result._replace(
+            startup=default_timer() - started - result.export)
 
     def compile(self, source, dest, is_two_file=True, post=None, lang=None):
         """Compile the source file into HTML and save as dest."""
+        key, result = self.export_uncached(source, dest, post, lang)
+        self.finish(source, dest, post, lang, key, result)
+
+    def compile_many(self, jobs, workers=None, lang=None):
+        """Compile a batch of posts concurrently.
+
+        The emacs exports run on `workers` threads (ORGMODE_EMACS_WORKERS or
+        the number of CPUs by default) and the shortcodes are applied on a
+        second thread pool as each export finishes. A post that fails doesn't
+        stop the rest of the batch.
+
+        Args:
+         jobs: (source, dest, post) tuples
+         workers: how many posts to export at the same time
+         lang: the language the posts are in
+
+        Returns:
+         dict mapping the source of each post that failed to its exception
+        """
+        workers = (workers or self.site.config.get('ORGMODE_EMACS_WORKERS')
+                   or os.cpu_count() or 1)
+        # build these here so the threads don't race to create them
+        self.pool
+        self.cache
+        self.profile
+        errors = {}
+        with ThreadPoolExecutor(workers) as exporter, \
+                ThreadPoolExecutor(workers) as shortcoder:
+            exports = {exporter.submit(self.export_uncached, source, dest,
+                                       post, lang): (source, dest, post)
+                       for source, dest, post in jobs}
+            shortcodes = {}
+            for future in as_completed(exports):
+                source, dest, post = exports[future]
+                try:
+                    key, result = future.result()
+                except Exception as error:
+                    self.logger.error(str(error))
+                    errors[source] = error
+                    continue
+                shortcodes[shortcoder.submit(
+                    self.finish, source, dest, post, lang, key,
+                    result)] = source
+            for future in as_completed(shortcodes):
+                try:
+                    future.result()
+                except Exception as error:
+                    self.logger.error(
+                        "Cannot finish {0}: {1}".format(shortcodes[future],
+                                                        error))
+                    errors[shortcodes[future]] = error
+        return errors
+
+    def cache_key(self, source, lang=None):
+        """The source's cache key (None if there's no cache or no emacs)."""
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.key(source, lang)
+        except OSError:
+            # leave it to the export to complain about a missing emacs
+            return None
+
+    def export_uncached(self, source, dest, post=None, lang=None):
+        """Copy the post from the cache or export it with emacs.
+
+        Returns:
+         tuple of the cache key and the ExportResult
+        """
+        key = self.cache_key(source, lang)
+        if key is not None:
+            dependencies = self.cache.get(key, dest)
+            if dependencies is not None:
+                self.save_dependencies(source, dest, post, dependencies)
+                return key, CACHED
+        return key, self.export_post(source, dest)
+
+    def export_post(self, source, dest):
+        """Export the source file to dest with emacs.
+
+        Returns:
+         ExportResult
+        """
         makedirs(os.path.dirname(dest))
         try:
-            command = [
-                'emacs', '--batch',
-                '-l', join(dirname(abspath(__file__)), 'init.el'),
-                '--eval', '(nikola-html-export "{0}" "{1}")'.format(
-                    abspath(source), abspath(dest))
-            ]
-
-            # Dirty walkaround for this plugin to run on Windows platform.
-            if os.name == 'nt':
-                command[5] = command[5].replace("\\", "\\\\")
-
-            subprocess.check_call(command)
-            with io.open(dest, 'r', encoding='utf-8') as inf:
-                output, shortcode_deps = self.site.apply_shortcodes(inf.read())
-            with io.open(dest, 'w', encoding='utf-8') as outf:
-                outf.write(output)
-            if post is None:
-                if shortcode_deps:
-                    self.logger.error(
-                        "Cannot save dependencies for post {0} (post unknown)",
-                        source)
-            else:
-                post._depfile[dest] += shortcode_deps
+            return self.export(source, dest)
         except OSError as e:
             import errno
             if e.errno == errno.ENOENT:
@@ -90,6 +577,52 @@ class CompileOrgmode(PageCompiler):
                             'use the orgmode compiler', python=False)
         except subprocess.CalledProcessError as e:
             raise Exception('Cannot compile {0} -- bad org-mode configuration (return code {1})'.format(source, e.returncode))
+        except (EmacsWorkerError, EmacsExportError) as e:
+            raise Exception('Cannot compile {0} -- {1}'.format(source, e))
+
+    def finish(self, source, dest, post, lang, key, result):
+        """Apply the shortcodes to an exported post and profile it."""
+        started = default_timer()
+        if not result.cached:
+            self.apply_shortcodes(source, dest, post, key, result.shortcodes)
+        if self.profile is not None:
+            shortcodes = default_timer() - started
+            self.profile.add(
+                source=source, dest=dest, lang=lang, cached=result.cached,
+                has_shortcodes=result.shortcodes, startup=result.startup,
+                export=result.export, shortcodes=shortcodes,
+                total=result.startup + result.export + shortcodes,
+                input_bytes=os.path.getsize(source),
+                output_bytes=os.path.getsize(dest))
+
+    def apply_shortcodes(self, source, dest, post=None, key=None,
+                         shortcodes=True):
+        """Apply the site's shortcodes to the exported HTML in dest.
+
+        If emacs found no shortcodes in the HTML dest is left alone,
+        otherwise it's replaced atomically so an interrupted build can't
+        leave half a file behind. If there's a cache key the result is stored
+        in the cache.
+        """
+        shortcode_deps = []
+        if shortcodes:
+            with io.open(dest, 'r', encoding='utf-8') as inf:
+                output, shortcode_deps = self.site.apply_shortcodes(
+                    inf.read())
+            write_atomically(dest, output.encode('utf-8'))
+        self.save_dependencies(source, dest, post, shortcode_deps)
+        if key is not None:
+            self.cache.put(key, dest, shortcode_deps)
+
+    def save_dependencies(self, source, dest, post, shortcode_deps):
+        """Add the shortcode dependencies to the post's dep-file."""
+        if post is None:
+            if shortcode_deps:
+                self.logger.error(
+                    "Cannot save dependencies for post {0} (post unknown)",
+                    source)
+        else:
+            post._depfile[dest] += shortcode_deps
 
     def create_post(self, path, content=None, onefile=False, is_page=False, **kw):
         """Create post file with optional metadata."""
@@ -0,0 +1,142 @@
+# coding=utf-8
+"""The system log builder feature tests."""
+# python
+from functools import partial
+from threading import Event
+import io
+import logging
+
+# pypi
+from expects import (
+    be,
+    contain,
+    equal,
+    expect,
+)
+from pytest_bdd import (
+    given,
+    then,
+    when,
+)
+import pytest_bdd
+
+# for testing
+from .fixtures import katamari
+
+# software under test
+from graeae.infrastructure.logging import HANDLERS, SysLogBuilder
+
+# constants
+scenario = partial(pytest_bdd.scenario, '../features/logging.feature')
+RECORDS = 20
+# a UDP address so the tests don't need /dev/log
+ADDRESS = ("localhost", 514)
+
+
+class StuckStream(io.StringIO):
+    """A stream that waits to be released before it writes"""
+    def __init__(self) -> None:
+        super().__init__()
+        self.released = Event()
+        return
+
+    def write(self, text: str) -> int:
+        self.released.wait()
+        return super().write(text)
+
+
+# ******************** blocking ******************** #
+@scenario('A queued logger writes everything at shutdown')
+def test_a_queued_logger_writes_everything_at_shutdown():
+    return
+
+
+@given('a queued logger that blocks when the queue is full')
+def a_queued_logger_that_blocks_when_the_queue_is_full(katamari):
+    katamari.builder = SysLogBuilder("queued-blocking", address=ADDRESS,
+                                     use_queue=True, queue_size=2,
+                                     block=True, shared=False)
+    katamari.stream = io.StringIO()
+    katamari.builder.console_logger.setStream(katamari.stream)
+    return
+
+
+@when('records are logged and the logger is stopped')
+def records_are_logged_and_the_logger_is_stopped(katamari):
+    for record in range(RECORDS):
+        katamari.builder.logger.info("record %d", record)
+    if isinstance(katamari.stream, StuckStream):
+        katamari.stream.released.set()
+    katamari.builder.stop()
+    return
+
+
+@then('all the records were written')
+def all_the_records_were_written(katamari):
+    lines = katamari.stream.getvalue().splitlines()
+    expect(len(lines)).to(equal(RECORDS))
+    expect(lines[-1]).to(contain(f"record {RECORDS - 1}"))
+    return
+
+# ******************** dropping ******************** #
+@scenario('A queued logger drops records when the queue is full')
+def test_a_queued_logger_drops_records_when_the_queue_is_full():
+    return
+
+
+@given('a queued logger with a stuck handler')
+def a_queued_logger_with_a_stuck_handler(katamari):
+    katamari.builder = SysLogBuilder("queued-dropping", address=ADDRESS,
+                                     use_queue=True, queue_size=2,
+                                     shared=False)
+    katamari.stream = StuckStream()
+    katamari.builder.console_logger.setStream(katamari.stream)
+    return
+
+
+@then('the dropped records are counted')
+def the_dropped_records_are_counted(katamari):
+    dropped = katamari.builder.queue_handler.dropped
+    lines = katamari.stream.getvalue().splitlines()
+    expect(dropped > 0).to(equal(True))
+    expect(len(lines)).to(equal(RECORDS - dropped + 1))
+    expect(lines[-1]).to(contain(f"{dropped:,} log records were dropped"))
+    return
+
+# ******************** sharing ******************** #
+@scenario('Loggers with the same configuration share handlers')
+def test_loggers_with_the_same_configuration_share_handlers():
+    return
+
+
+@given('two log builders with the same configuration')
+def two_log_builders_with_the_same_configuration(katamari):
+    katamari.builders = [SysLogBuilder(name, address=ADDRESS)
+                         for name in ("shared-one", "shared-two")]
+    katamari.different = SysLogBuilder("shared-three", address=ADDRESS,
+                                       console_level=logging.WARNING)
+    return
+
+
+@when('their loggers are built')
+def their_loggers_are_built(katamari):
+    katamari.loggers = [builder.logger for builder in katamari.builders]
+    katamari.different_logger = katamari.different.logger
+    return
+
+
+@then('the loggers share the handlers and formatters')
+def the_loggers_share_the_handlers_and_formatters(katamari):
+    one, two = katamari.loggers
+    for first, second in zip(one.handlers, two.handlers):
+        expect(first).to(be(second))
+    one, two = katamari.builders
+    expect(one.console_formatter).to(be(HANDLERS.formatter(
+        one.console_format)))
+    # the same address and format but a different level
+    expect(katamari.different.sys_logger).to(be(one.sys_logger))
+    expect(katamari.different.console_logger is one.console_logger).to(
+        equal(False))
+    expect(katamari.different.console_formatter).to(be(
+        one.console_formatter))
+    return
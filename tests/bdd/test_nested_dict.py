@@ -2,6 +2,7 @@
 """A nested dict feature tests."""
 # python
 from functools import partial
+from inspect import isgenerator
 import random
 
 # pypi
@@ -21,7 +22,7 @@ import pytest_bdd
 from .fixtures import katamari
 
 # software under test
-from graeae.collections.nested_dict import NestedDict
+from graeae.collections.nested_dict import FrozenNestedDict, NestedDict
 
 # constants
 scenario = partial(pytest_bdd.scenario, '../features/nested_dict.feature')
@@ -192,3 +193,274 @@ def check_value_at_path(katamari):
         actual = actual[key]
     expect(actual).to(equal(katamari.expected))
     return
+
+# ******************** indexed ******************** #
+
+
+@scenario("An indexed nested dict gets values")
+def test_indexed_get():
+    return
+
+
+@given("an indexed nested dict with nested dicts")
+def setup_indexed(katamari):
+    katamari.nested = NestedDict(dictionary=dict(a={"b": {"c": {"d": 3}}}),
+                                 indexed=True)
+    return
+
+
+@when("a path to a value is used as a key to get an indexed value")
+def get_indexed_value(katamari):
+    katamari.expected = 3
+    katamari.actual = katamari.nested["a/b/c/d"]
+    return
+
+#  Then it's the expected value
+
+# ********** index stays in sync ********** #
+
+
+@scenario("An indexed nested dict keeps the index up to date")
+def test_indexed_set():
+    return
+
+#  Given an indexed nested dict with nested dicts
+
+
+@when("a sub-dict is replaced with a path")
+def replace_sub_dict(katamari):
+    katamari.nested["a/b"] = {"e": {"f": 5}}
+    katamari.nested["a/g/h"] = 6
+    katamari.expected = {"a", "a/b", "a/b/e", "a/b/e/f", "a/g", "a/g/h"}
+    return
+
+
+@then("the index only has the paths in the dictionary")
+def check_index(katamari):
+    expect(set(katamari.nested._index)).to(equal(katamari.expected))
+    for path in katamari.expected:
+        expect(katamari.nested._index[path]).to(
+            equal(NestedDict(dictionary=katamari.nested.dictionary)[path]))
+    return
+
+# ******************** tuple keys ******************** #
+
+
+@scenario("A tuple of keys is used as a path")
+def test_tuple_keys():
+    return
+
+#  Given a nested dict
+
+
+@when("a value is set and retrieved with a tuple of keys")
+def set_tuple_keys(katamari):
+    katamari.expected = 7
+    katamari.nested[("x", "y", "z")] = katamari.expected
+    katamari.actual = katamari.nested[("x", "y", "z")]
+    return
+
+#  Then it's the expected value
+
+
+@then("the string path gets the same value")
+def check_string_path(katamari):
+    expect(katamari.nested["x/y/z"]).to(equal(katamari.expected))
+    return
+
+# ******************** path cache ******************** #
+
+
+@scenario("Nested dicts with the same separator share the path cache")
+def test_path_cache():
+    return
+
+#  Given a nested dict
+
+
+@when("another nested dict with the same separator is built")
+def build_another(katamari):
+    katamari.other = NestedDict()
+    katamari.nested["a/b"] = 1
+    katamari.nested["a/b"]
+    return
+
+
+@then("they share the path splitter")
+def check_splitter(katamari):
+    expect(katamari.other.split_path).to(equal(katamari.nested.split_path))
+    expect(katamari.other.split_path("a/b")).to(equal(("a", "b")))
+    expect(katamari.nested.split_path.cache_info().hits > 0).to(equal(True))
+    return
+
+# ******************** update many ******************** #
+
+
+@scenario("Many paths are set at once")
+def test_update_many():
+    return
+
+#  Given an indexed nested dict with nested dicts
+
+
+@when("a flat mapping of paths is set with update many")
+def update_many(katamari):
+    katamari.mapping = {"a/b/c/e": 4, "a/x": 5, ("a", "y", "z"): 6,
+                        "q/r": 7}
+    katamari.nested.update_many(katamari.mapping)
+    katamari.expected = {"a", "a/b", "a/b/c", "a/b/c/d", "a/b/c/e", "a/x",
+                         "a/y", "a/y/z", "q", "q/r"}
+    return
+
+
+@then("the values are at the end of their paths")
+def check_update_many(katamari):
+    for path, value in katamari.mapping.items():
+        expect(katamari.nested[path]).to(equal(value))
+    expect(katamari.nested["a/b/c/d"]).to(equal(3))
+    return
+
+#  And the index only has the paths in the dictionary
+
+# ******************** deep merge ******************** #
+
+
+@scenario("Another tree is merged in")
+def test_deep_merge():
+    return
+
+#  Given an indexed nested dict with nested dicts
+
+
+@when("another tree is deep-merged into it")
+def deep_merge(katamari):
+    katamari.other = {"a": {"b": {"c": {"e": 4}, "f": 5}, "g": {"h": 6}}}
+    katamari.nested.deep_merge(NestedDict(dictionary=katamari.other))
+    katamari.expected = {"a", "a/b", "a/b/c", "a/b/c/d", "a/b/c/e", "a/b/f",
+                         "a/g", "a/g/h"}
+    return
+
+
+@then("the trees are merged")
+def check_merge(katamari):
+    expect(katamari.nested.dictionary).to(equal(
+        {"a": {"b": {"c": {"d": 3, "e": 4}, "f": 5}, "g": {"h": 6}}}))
+    # the other tree's dictionaries get copied, not shared
+    katamari.nested["a/g/i"] = 7
+    katamari.expected.add("a/g/i")
+    expect(katamari.other["a"]["g"]).to(equal({"h": 6}))
+    return
+
+#  And the index only has the paths in the dictionary
+
+# ******************** iter leaves ******************** #
+
+
+@scenario("The leaves are iterated over")
+def test_iter_leaves():
+    return
+
+#  Given a nested dict with nested dicts
+
+
+@when("the leaves are iterated over")
+def iterate_leaves(katamari):
+    katamari.nested["a/b/e"] = 4
+    katamari.nested["a/f"] = {}
+    katamari.actual = katamari.nested.iter_leaves()
+    return
+
+
+@then("they are the paths and values of the leaves")
+def check_leaves(katamari):
+    expect(isgenerator(katamari.actual)).to(equal(True))
+    expect(sorted(katamari.nested.iter_leaves())).to(equal(
+        [("a/b/c/d", 3), ("a/b/e", 4), ("a/f", {})]))
+    return
+
+# ******************** frozen ******************** #
+
+
+@scenario("A nested dict is frozen")
+def test_frozen():
+    return
+
+#  Given a nested dict with nested dicts
+
+
+@when("the nested dict is frozen")
+def freeze(katamari):
+    katamari.nested["a/b/e"] = 4
+    katamari.nested["f"] = 5
+    katamari.frozen = katamari.nested.freeze()
+    return
+
+
+@then("the frozen dict has the same paths and values")
+def check_frozen_values(katamari):
+    for path, value in katamari.nested.iter_leaves():
+        expect(katamari.frozen[path]).to(equal(value))
+    expect(dict(katamari.frozen["a/b"].items())).to(
+        equal({"c": katamari.frozen["a/b/c"], "e": 4}))
+    expect(katamari.frozen.thaw().dictionary).to(
+        equal(katamari.nested.dictionary))
+    expect(lambda: katamari.frozen["a/q"]).to(raise_error(KeyError))
+    return
+
+
+@then("the frozen dict is hashable")
+def check_frozen_hash(katamari):
+    other = FrozenNestedDict(katamari.nested.dictionary)
+    expect(other).to(equal(katamari.frozen))
+    expect(hash(other)).to(equal(hash(katamari.frozen)))
+    return
+
+
+@then("the frozen dict can't be changed")
+def check_frozen_read_only(katamari):
+    def set_item():
+        katamari.frozen["a/b/e"] = 6
+
+    def set_attribute():
+        katamari.frozen.root = None
+    expect(set_item).to(raise_error(TypeError))
+    expect(set_attribute).to(raise_error(AttributeError))
+    return
+
+# ******************** save and open ******************** #
+
+
+@scenario("A nested dict is saved and opened")
+def test_save_open():
+    return
+
+#  Given a nested dict with nested dicts
+
+
+@when("the nested dict is saved and opened again")
+def save_and_open(katamari, tmp_path):
+    katamari.nested["a/b/e"] = "five"
+    katamari.nested["a/f"] = dict(g=1.5, h=None, i=True, j=b"bytes",
+                                  k=[1, 2], l=2**70, m={})
+    path = tmp_path/"nested.bin"
+    katamari.nested.save(path)
+    katamari.mapped = NestedDict.open(path)
+    katamari.loaded = NestedDict.open(path, mmap=False)
+    return
+
+
+@then("the mapped dict has the same paths and values")
+def check_mapped(katamari):
+    with katamari.mapped as mapped:
+        for path, value in katamari.nested.iter_leaves():
+            expect(mapped[path]).to(equal(value))
+        expect(sorted(mapped["a/b"])).to(equal(["c", "e"]))
+        expect(lambda: mapped["a/q"]).to(raise_error(KeyError))
+    return
+
+
+@then("the loaded dict has the same dictionary")
+def check_loaded(katamari):
+    expect(type(katamari.loaded)).to(equal(NestedDict))
+    expect(katamari.loaded.dictionary).to(equal(katamari.nested.dictionary))
+    return
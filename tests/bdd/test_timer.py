@@ -0,0 +1,320 @@
+# coding=utf-8
+"""A timer feature tests."""
+# python
+from functools import partial
+import asyncio
+from itertools import count
+from time import perf_counter
+from types import SimpleNamespace
+import sys
+import threading
+
+# pypi
+from expects import (
+    be_empty,
+    be_none,
+    equal,
+    expect,
+)
+from pytest_bdd import (
+    given,
+    then,
+    when,
+)
+import pytest_bdd
+
+# for testing
+from .fixtures import katamari
+
+# software under test
+from graeae.timers import SamplingProfiler, Timer, TimerRegistry, Trace
+from graeae.timers.timer import Speaker
+
+# constants
+scenario = partial(pytest_bdd.scenario, '../features/timer.feature')
+STEP = 10
+
+
+class FakeClock:
+    """A clock that goes up by step nanoseconds every time it's called"""
+    def __init__(self, step: int=STEP) -> None:
+        self.ticks = count(step=step)
+        return
+
+    def __call__(self) -> int:
+        return next(self.ticks)
+
+
+# ******************** the clock ******************** #
+@scenario('The timer uses a nanosecond clock')
+def test_the_timer_uses_a_nanosecond_clock():
+    return
+
+
+@given('a timer with a fake clock')
+def a_timer_with_a_fake_clock(katamari):
+    katamari.output = []
+    katamari.timer = Timer(clock=FakeClock(), output=katamari.output.append)
+    return
+
+
+@when('the timer is started and ended')
+def the_timer_is_started_and_ended(katamari):
+    with katamari.timer:
+        pass
+    return
+
+
+@then('the elapsed nanoseconds come from the clock')
+def the_elapsed_nanoseconds_come_from_the_clock(katamari):
+    expect(katamari.timer.elapsed_ns).to(equal(STEP))
+    expect(katamari.output[-1]).to(
+        equal(f"Elapsed: {katamari.timer.elapsed}"))
+    return
+
+# ******************** laps ******************** #
+@scenario('The timer takes laps and splits')
+def test_the_timer_takes_laps_and_splits():
+    return
+
+
+@when('the timer takes laps and a split')
+def the_timer_takes_laps_and_a_split(katamari):
+    timer = katamari.timer
+    timer.start()
+    katamari.first = timer.lap()
+    katamari.split = timer.split()
+    katamari.second = timer.lap()
+    timer.end()
+    return
+
+
+@then('the laps and split are the expected nanoseconds')
+def the_laps_and_split_are_the_expected_nanoseconds(katamari):
+    expect(katamari.first).to(equal(STEP))
+    # the split doesn't reset the lap so the second lap spans it
+    expect(katamari.split).to(equal(2 * STEP))
+    expect(katamari.second).to(equal(2 * STEP))
+    expect(katamari.timer.laps).to(equal([STEP, 2 * STEP]))
+    expect(katamari.timer.elapsed_ns).to(equal(4 * STEP))
+    return
+
+# ******************** raw ******************** #
+@scenario('A raw timer only stores the times')
+def test_a_raw_timer_only_stores_the_times():
+    return
+
+
+@given('a raw timer with a fake clock')
+def a_raw_timer_with_a_fake_clock(katamari):
+    katamari.output = []
+    katamari.timer = Timer(clock=FakeClock(), output=katamari.output.append,
+                           raw=True)
+    return
+
+
+@then('nothing was sent to the output')
+def nothing_was_sent_to_the_output(katamari):
+    expect(katamari.output).to(be_empty)
+    expect(katamari.timer.started).to(be_none)
+    expect(katamari.timer.elapsed_ns).to(equal(STEP))
+    return
+
+# ******************** the registry ******************** #
+@scenario('A timer registry keeps statistics for each name')
+def test_a_timer_registry_keeps_statistics_for_each_name():
+    return
+
+
+@given('a timer registry')
+def a_timer_registry(katamari):
+    katamari.output = []
+    katamari.registry = TimerRegistry(clock=FakeClock(),
+                                      output=katamari.output.append)
+    return
+
+
+@when('timers with the same name are used many times')
+def timers_with_the_same_name_are_used_many_times(katamari):
+    for time in range(1, 101):
+        katamari.registry.record("handler", time * 1000)
+    with katamari.registry.timer("tick"):
+        pass
+    katamari.registry.emit()
+    return
+
+
+@then('the registry has the statistics for the name')
+def the_registry_has_the_statistics_for_the_name(katamari):
+    statistics = katamari.registry.statistics()
+    handler = statistics["handler"]
+    expect(handler["count"]).to(equal(100))
+    expect(handler["mean"]).to(equal(50500))
+    expect(handler["max"]).to(equal(100000))
+    # the buckets are within 1/64th of the value
+    for percent in (50, 95, 99):
+        expected = percent * 1000
+        expect(abs(handler[f"p{percent}"] - expected) <= expected/64).to(
+            equal(True))
+    expect(statistics["tick"]["max"]).to(equal(STEP))
+    expect(len(katamari.output)).to(equal(1))
+    return
+
+# ******************** async ******************** #
+@scenario('Concurrent coroutines share a timer')
+def test_concurrent_coroutines_share_a_timer():
+    return
+
+
+@when('the timer decorates coroutines that run at the same time')
+def the_timer_decorates_coroutines_that_run_at_the_same_time(katamari):
+    timer = katamari.timer
+    katamari.runs = {}
+
+    @timer
+    async def timed(name: str, pauses: int) -> str:
+        for pause in range(pauses):
+            await asyncio.sleep(0)
+        katamari.runs[name] = timer.run
+        return name
+
+    async def main():
+        return await asyncio.gather(timed("slow", 3), timed("fast", 1))
+
+    katamari.names = asyncio.run(main())
+    return
+
+
+@then('each coroutine gets its own run')
+def each_coroutine_gets_its_own_run(katamari):
+    expect(katamari.names).to(equal(["slow", "fast"]))
+    slow, fast = katamari.runs["slow"], katamari.runs["fast"]
+    expect(slow is fast).to(equal(False))
+    # the fast one ended first so the slow one's run is the last run
+    expect(katamari.timer.last_run is slow).to(equal(True))
+    expect(fast.end_ns < slow.end_ns).to(equal(True))
+    return
+
+# ******************** speaking ******************** #
+class FakeEngine:
+    """Stands in for the pyttsx3 engine"""
+    def __init__(self) -> None:
+        self.said = []
+        return
+
+    def say(self, message: str) -> None:
+        self.said.append((message, threading.current_thread().name))
+        return
+
+    def runAndWait(self) -> None:
+        return
+
+    def stop(self) -> None:
+        return
+
+
+@scenario('The timer speaks in the background')
+def test_the_timer_speaks_in_the_background():
+    return
+
+
+@given('a timer that speaks')
+def a_timer_that_speaks(katamari, monkeypatch):
+    katamari.engine = FakeEngine()
+    monkeypatch.setitem(sys.modules, "pyttsx3",
+                        SimpleNamespace(init=lambda: katamari.engine))
+    katamari.speaker = Speaker()
+    monkeypatch.setattr("graeae.timers.timer.SPEAKER", katamari.speaker)
+    katamari.timer = Timer(container=False, emit=False, message="Done")
+    return
+
+
+@then("the message is said on the speaker's thread")
+def the_message_is_said_on_the_speakers_thread(katamari):
+    katamari.speaker.close()
+    expect(katamari.engine.said).to(equal([("Done", "graeae-speaker")]))
+    return
+
+# ******************** spans ******************** #
+@scenario('Timers started inside other timers become their children')
+def test_timers_started_inside_other_timers_become_their_children():
+    return
+
+
+@given('a trace and nested timers')
+def a_trace_and_nested_timers(katamari):
+    # the collapsed stacks are in microseconds
+    clock = FakeClock(step=1000)
+    katamari.trace = Trace()
+    katamari.outer = Timer(raw=True, clock=clock, name="pipeline")
+    katamari.inner = Timer(raw=True, clock=clock, name="download")
+    return
+
+
+@when('the nested timers are run inside the trace')
+def the_nested_timers_are_run_inside_the_trace(katamari):
+    with katamari.trace:
+        with katamari.outer:
+            for repeat in range(2):
+                with katamari.inner:
+                    pass
+    # outside of the trace the timers don't add spans
+    with katamari.outer:
+        pass
+    return
+
+
+@then('the trace exports the nested spans')
+def the_trace_exports_the_nested_spans(katamari):
+    root, = katamari.trace.roots
+    expect([child.name for child in root.children]).to(
+        equal(["download", "download"]))
+    # each clock-call is a microsecond
+    lines = sorted(katamari.trace.collapsed().split("\n"))
+    expect(lines).to(equal(["pipeline 3", "pipeline;download 2"]))
+    events = katamari.trace.chrome_trace()["traceEvents"]
+    expect([(event["name"], event["ph"], event["ts"], event["dur"])
+            for event in events]).to(equal([
+                ("pipeline", "X", 0, 5),
+                ("download", "X", 1, 1),
+                ("download", "X", 3, 1)]))
+    return
+
+# ******************** profiler ******************** #
+def spin(seconds: float) -> int:
+    """Keeps the CPU busy"""
+    ended = perf_counter() + seconds
+    spins = 0
+    while perf_counter() < ended:
+        spins += 1
+    return spins
+
+
+@scenario('The sampling profiler finds the hot function')
+def test_the_sampling_profiler_finds_the_hot_function():
+    return
+
+
+@given('a sampling profiler')
+def a_sampling_profiler(katamari):
+    katamari.output = []
+    katamari.profiler = SamplingProfiler(output=katamari.output.append,
+                                         interval=0.001)
+    return
+
+
+@when('a busy function is profiled')
+def a_busy_function_is_profiled(katamari):
+    with katamari.profiler:
+        spin(0.1)
+    return
+
+
+@then('the busy function is in the hot functions')
+def the_busy_function_is_in_the_hot_functions(katamari):
+    report, = katamari.output
+    expect(katamari.profiler.samples > 0).to(equal(True))
+    hottest, count = katamari.profiler.own.most_common(1)[0]
+    expect(hottest.co_name).to(equal("spin"))
+    expect("spin (test_timer.py" in report).to(equal(True))
+    return
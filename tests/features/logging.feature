@@ -0,0 +1,16 @@
+Feature: The system log builder
+
+Scenario: A queued logger writes everything at shutdown
+  Given a queued logger that blocks when the queue is full
+  When records are logged and the logger is stopped
+  Then all the records were written
+
+Scenario: A queued logger drops records when the queue is full
+  Given a queued logger with a stuck handler
+  When records are logged and the logger is stopped
+  Then the dropped records are counted
+
+Scenario: Loggers with the same configuration share handlers
+  Given two log builders with the same configuration
+  When their loggers are built
+  Then the loggers share the handlers and formatters
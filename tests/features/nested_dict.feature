@@ -30,3 +30,54 @@ Scenario: A value is set
   Given a nested dict
   When a value is set with a path
   Then the value is at the end of the path
+
+Scenario: An indexed nested dict gets values
+  Given an indexed nested dict with nested dicts
+  When a path to a value is used as a key to get an indexed value
+  Then it's the expected value
+
+Scenario: An indexed nested dict keeps the index up to date
+  Given an indexed nested dict with nested dicts
+  When a sub-dict is replaced with a path
+  Then the index only has the paths in the dictionary
+
+Scenario: A tuple of keys is used as a path
+  Given a nested dict
+  When a value is set and retrieved with a tuple of keys
+  Then it's the expected value
+  And the string path gets the same value
+
+Scenario: Nested dicts with the same separator share the path cache
+  Given a nested dict
+  When another nested dict with the same separator is built
+  Then they share the path splitter
+
+Scenario: Many paths are set at once
+  Given an indexed nested dict with nested dicts
+  When a flat mapping of paths is set with update many
+  Then the values are at the end of their paths
+  And the index only has the paths in the dictionary
+
+Scenario: Another tree is merged in
+  Given an indexed nested dict with nested dicts
+  When another tree is deep-merged into it
+  Then the trees are merged
+  And the index only has the paths in the dictionary
+
+Scenario: The leaves are iterated over
+  Given a nested dict with nested dicts
+  When the leaves are iterated over
+  Then they are the paths and values of the leaves
+
+Scenario: A nested dict is frozen
+  Given a nested dict with nested dicts
+  When the nested dict is frozen
+  Then the frozen dict has the same paths and values
+  And the frozen dict is hashable
+  And the frozen dict can't be changed
+
+Scenario: A nested dict is saved and opened
+  Given a nested dict with nested dicts
+  When the nested dict is saved and opened again
+  Then the mapped dict has the same paths and values
+  And the loaded dict has the same dictionary
@@ -0,0 +1,41 @@
+Feature: A timer
+
+Scenario: The timer uses a nanosecond clock
+  Given a timer with a fake clock
+  When the timer is started and ended
+  Then the elapsed nanoseconds come from the clock
+
+Scenario: The timer takes laps and splits
+  Given a timer with a fake clock
+  When the timer takes laps and a split
+  Then the laps and split are the expected nanoseconds
+
+Scenario: A raw timer only stores the times
+  Given a raw timer with a fake clock
+  When the timer is started and ended
+  Then nothing was sent to the output
+
+Scenario: A timer registry keeps statistics for each name
+  Given a timer registry
+  When timers with the same name are used many times
+  Then the registry has the statistics for the name
+
+Scenario: Concurrent coroutines share a timer
+  Given a timer with a fake clock
+  When the timer decorates coroutines that run at the same time
+  Then each coroutine gets its own run
+
+Scenario: The timer speaks in the background
+  Given a timer that speaks
+  When the timer is started and ended
+  Then the message is said on the speaker's thread
+
+Scenario: Timers started inside other timers become their children
+  Given a trace and nested timers
+  When the nested timers are run inside the trace
+  Then the trace exports the nested spans
+
+Scenario: The sampling profiler finds the hot function
+  Given a sampling profiler
+  When a busy function is profiled
+  Then the busy function is in the hot functions